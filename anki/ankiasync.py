@@ -0,0 +1,234 @@
+"""Asyncio AnkiConnect client for event-loop callers of the keybinding decks.
+
+The same AnkiConnect actions as `ankipush.invoke`, but awaitable: requests run
+over a small pool of keep-alive connections, and a semaphore caps how many are
+in flight so Anki's single GUI thread is never flooded. Independent reads
+overlap instead of queueing behind each other:
+
+    async with AnkiConnectAsync() as anki:
+        decks, models = await asyncio.gather(
+            anki.invoke("deckNames"), anki.invoke("modelNames")
+        )
+        ids = await asyncio.gather(
+            *(anki.invoke("findNotes", query=f"note:{m}") for m in models)
+        )
+
+AnkiConnect's HTTP server answers one request per connection at a time, so
+"pipelining" here means `multi()`: many actions in one round trip, each
+result or error mapped back to its own slot. `push_decks()` runs the regular
+push pipeline off the event loop. Stdlib only.
+"""
+
+import asyncio
+import json
+import urllib.parse
+
+import ankipush
+
+
+class AnkiConnectAsync:
+    """Pooled, concurrency-limited async AnkiConnect client."""
+
+    def __init__(
+        self,
+        url=None,
+        max_in_flight=4,
+        connect_timeout=3,
+        read_timeout=30,
+        retries=3,
+        backoff=0.2,
+    ):
+        self.url = url or ankipush.ANKI_URL
+        parts = urllib.parse.urlsplit(self.url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 8765
+        self.path = parts.path or "/"
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.requests = 0
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._idle = []  # (reader, writer) pairs ready for reuse
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        for _, writer in idle:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _open(self):
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.connect_timeout
+        )
+
+    async def _read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("AnkiConnect closed the connection")
+        _, status, *reason = status_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = bytearray()
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                body += await reader.readexactly(size)
+                await reader.readexactly(2)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            headers["connection"] = "close"
+        if status != "200":
+            raise ConnectionError(f"HTTP {status} {''.join(reason).strip()}")
+        keep = headers.get("connection", "").lower() != "close"
+        return json.loads(body), keep
+
+    def _reusable(self):
+        """An idle connection the server has not closed yet, or None.
+
+        AnkiConnect closes after every response without "Connection: close";
+        once the event loop has seen that EOF, the reader is at_eof().
+        """
+        while self._idle:
+            reader, writer = conn = self._idle.pop()
+            if not (reader.at_eof() or writer.is_closing()):
+                return conn
+            writer.close()
+        return None
+
+    async def _send(self, conn, body):
+        reader, writer = conn
+        try:
+            writer.write(
+                (
+                    f"POST {self.path} HTTP/1.1\r\n"
+                    f"Host: {self.host}:{self.port}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n"
+                ).encode()
+                + body
+            )
+            await writer.drain()
+        except BaseException:
+            writer.close()
+            raise
+
+    async def _receive(self, conn):
+        reader, writer = conn
+        try:
+            resp, keep = await asyncio.wait_for(
+                self._read_response(reader), self.read_timeout
+            )
+        except BaseException:
+            writer.close()
+            raise
+        if keep:
+            self._idle.append(conn)
+        else:
+            writer.close()
+        return resp
+
+    async def _roundtrip(self, body, idempotent=False):
+        self.requests += 1
+        conn = self._reusable()
+        if conn is not None:
+            # The server may have closed this pooled socket before the loop
+            # saw its EOF. Unsent, the request is resent once on a fresh
+            # connection at no backoff; if only the reply was lost Anki may
+            # have run it, so then only idempotent requests go again (the
+            # same rule as ankipush.Transport).
+            try:
+                await self._send(conn, body)
+            except ConnectionError:
+                pass
+            else:
+                try:
+                    return await self._receive(conn)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    if not idempotent:
+                        raise
+        conn = await self._open()
+        await self._send(conn, body)
+        return await self._receive(conn)
+
+    async def request(self, action, params):
+        """One request with the raw {"result", "error"} reply; retries like Transport."""
+        body = json.dumps({"action": action, "version": 6, "params": params}).encode()
+        idempotent = ankipush._is_idempotent(action, params)
+        attempts = 1 + (self.retries if idempotent else 0)
+        async with self._slots:
+            for attempt in range(attempts):
+                try:
+                    return await self._roundtrip(body, idempotent)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    if attempt + 1 == attempts:
+                        raise
+                    await asyncio.sleep(self.backoff * 2**attempt)
+
+    async def invoke(self, action, **params):
+        resp = await self.request(action, params)
+        if resp.get("error") is not None:
+            raise RuntimeError(f"AnkiConnect error for '{action}': {resp['error']}")
+        return resp["result"]
+
+    async def multi(self, calls, chunk=ankipush.MULTI_CHUNK):
+        """Run [(action, params), ...] as "multi" requests; returns ankipush.Calls.
+
+        Chunks of a long list are sent concurrently (still bounded by the
+        semaphore); read each `.result` to get the value or raise its error.
+        """
+        pending = [ankipush.Call(action, params) for action, params in calls]
+        chunks = [pending[i : i + chunk] for i in range(0, len(pending), chunk)]
+
+        async def send(part):
+            actions = [
+                {"action": c.action, "version": 6, "params": c.params} for c in part
+            ]
+            for call, item in zip(part, await self.invoke("multi", actions=actions)):
+                call._resolve(item)
+
+        await asyncio.gather(*(send(part) for part in chunks))
+        return pending
+
+    async def snapshot(self, models):
+        """deckNames, modelNames and each model's note ids, fetched concurrently."""
+        decks, names, *ids = await asyncio.gather(
+            self.invoke("deckNames"),
+            self.invoke("modelNames"),
+            *(
+                self.invoke("findNotes", query=ankipush._search("note", m))
+                for m in models
+            ),
+        )
+        return {"decks": decks, "models": names, "notes": dict(zip(models, ids))}
+
+
+async def push_decks(plans, force=False, chunk_size=ankipush.CHUNK_SIZE):
+    """ankipush.push_decks without blocking the event loop.
+
+    The push pipeline is sequential by design (each phase depends on the last),
+    so it runs in a worker thread over the shared keep-alive Transport.
+    """
+    await asyncio.to_thread(
+        ankipush.push_decks, plans, force=force, chunk_size=chunk_size
+    )
@@ -1,21 +1,36 @@
+#!/usr/bin/env python3
 """Shared AnkiConnect helpers for the keybinding decks in this folder.
 
 Each deck folder (nvim/, popos/, …) has a `cards.py` with a CARDS list of
-`(category, action, key, mode, notes, source)` tuples and a thin `push.py` that
-calls `push_cards(...)` here. The action is the prompt (front); the key is the
-answer (back), rendered as styled <kbd> tokens.
+`(category, action, key, mode, notes, source)` tuples (plus ROOT_DECK, MODEL and
+SUBDECKS) and a thin `push.py` that calls `push_cards(...)` here; running this
+file directly pushes every deck folder in one session. The action is the prompt
+(front); the key is the answer (back), rendered as styled <kbd> tokens.
 
 Prerequisites: AnkiConnect add-on (code 2055492159) installed and Anki running
 (serves a local API on 127.0.0.1:8765). Stdlib only; idempotent.
 """
 
+import argparse
+import atexit
+import concurrent.futures
+import contextlib
+import functools
+import glob
+import hashlib
+import http.client
+import importlib.util
+import itertools
 import json
 import os
 import re
+import select
+import socket
 import sys
-import urllib.error
-import urllib.request
-from collections import defaultdict
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict
 
 # AnkiConnect's documented default is port 8765. Override with ANKI_CONNECT_URL
 # (e.g. when another local service already owns 8765).
@@ -23,19 +38,172 @@ ANKI_URL = os.environ.get("ANKI_CONNECT_URL", "http://127.0.0.1:8765")
 
 # ---------------------------------------------------------------------------
 # AnkiConnect transport
+#   One keep-alive HTTP connection shared by every invoke(); dropped and
+#   re-opened after a failure, and re-opened before use if the server has
+#   closed it (the AnkiConnect add-on closes after every response). Actions
+#   that are safe to repeat are retried with exponential backoff; everything
+#   else fails fast, except that a request that could not be sent on a reused
+#   connection is resent once.
 # ---------------------------------------------------------------------------
 
+# Actions whose effect is the same whether Anki sees them once or twice.
+IDEMPOTENT = frozenset(
+    {
+        "version",
+        "deckNames",
+        "modelNames",
+        "findNotes",
+        "findCards",
+        "notesInfo",
+        "cardsInfo",
+        "canAddNotes",
+        "createDeck",
+        "changeDeck",
+        "updateModelStyling",
+        "updateModelTemplates",
+        "updateNoteFields",
+        "addTags",
+        "removeTags",
+    }
+)
+
+
+def _is_idempotent(action, params):
+    if action == "multi":
+        return all(
+            _is_idempotent(a["action"], a.get("params", {})) for a in params["actions"]
+        )
+    return action in IDEMPOTENT
+
+
+class Transport:
+    """Persistent http.client connection to AnkiConnect.
+
+    `connect_timeout` bounds the TCP handshake (Anki not running fails fast);
+    `read_timeout` bounds each response, which can take a while for big
+    addNotes/notesInfo payloads on a busy GUI thread.
+    """
+
+    def __init__(
+        self, url=ANKI_URL, connect_timeout=3, read_timeout=30, retries=3, backoff=0.2
+    ):
+        parts = urllib.parse.urlsplit(url)
+        self.url = url
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 8765
+        self.path = parts.path or "/"
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.requests = 0
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            conn = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.connect_timeout
+            )
+            conn.connect()
+            conn.sock.settimeout(self.read_timeout)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _stale(self):
+        """True if the server already closed the kept-alive socket.
+
+        AnkiConnect's server closes after every response without saying
+        "Connection: close"; its EOF is then waiting to be read.
+        """
+        sock = self._conn.sock
+        if sock is None:
+            return True
+        if not select.select([sock], [], [], 0)[0]:
+            return False
+        try:
+            return sock.recv(1, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+
+    def _send(self, body):
+        """POST `body` on the shared connection and return that connection."""
+        conn = self._connection()
+        conn.request("POST", self.path, body, {"Content-Type": "application/json"})
+        return conn
+
+    def _roundtrip(self, body, idempotent=False):
+        self.requests += 1
+        if self._conn is not None and self._stale():
+            self.close()
+        reused, sent = self._conn is not None, False
+        try:
+            conn = self._send(body)
+            sent = True
+            resp = conn.getresponse()
+        except ConnectionError:
+            # A reused socket the server closed in the meantime. If sending
+            # failed, Anki never saw the request and it is resent once, with
+            # no backoff. If only the reply was lost (RemoteDisconnected is a
+            # ConnectionResetError), Anki may have run it: only idempotent
+            # requests go again, so an addNotes is never applied twice.
+            self.close()
+            if not reused or (sent and not idempotent):
+                raise
+            resp = self._send(body).getresponse()
+        data = resp.read()
+        if resp.will_close:
+            self.close()
+        if resp.status != 200:
+            raise http.client.HTTPException(f"HTTP {resp.status} {resp.reason}")
+        return data
+
+    def request(self, action, params):
+        started = time.perf_counter()
+        body = json.dumps({"action": action, "version": 6, "params": params}).encode()
+        encoded = time.perf_counter()
+        idempotent = _is_idempotent(action, params)
+        attempts = 1 + (self.retries if idempotent else 0)
+        for attempt in range(attempts):
+            try:
+                data = self._roundtrip(body, idempotent)
+                break
+            except (OSError, http.client.HTTPException):
+                self.close()
+                if attempt + 1 == attempts:
+                    raise
+                time.sleep(self.backoff * 2**attempt)
+        received = time.perf_counter()
+        resp = json.loads(data)
+        if _tracer is not None:
+            _tracer.request(
+                action, params, len(body), len(data), started, encoded, received
+            )
+        return resp
+
+
+_transport = None
+
+
+def transport():
+    """The shared Transport, created on first use."""
+    global _transport
+    if _transport is None:
+        _transport = Transport()
+    return _transport
+
 
 def invoke(action, **params):
-    payload = json.dumps({"action": action, "version": 6, "params": params}).encode()
-    req = urllib.request.Request(
-        ANKI_URL, payload, {"Content-Type": "application/json"}
-    )
+    conn = transport()
     try:
-        resp = json.load(urllib.request.urlopen(req, timeout=15))
-    except urllib.error.URLError as exc:
+        resp = conn.request(action, params)
+    except (OSError, http.client.HTTPException) as exc:
         sys.exit(
-            f"\n✗ Cannot reach AnkiConnect at {ANKI_URL}.\n"
+            f"\n✗ Cannot reach AnkiConnect at {conn.url}.\n"
             f"  Is Anki running with the AnkiConnect add-on (code 2055492159)?\n"
             f"  Details: {exc}\n"
         )
@@ -44,6 +212,266 @@ def invoke(action, **params):
     return resp["result"]
 
 
+# ---------------------------------------------------------------------------
+# Tracing (opt-in: --trace / --trace-file PATH, or ANKIPUSH_TRACE=1 or a path).
+# Every request is recorded with its action(s), bytes each way, and time spent
+# encoding JSON, waiting on Anki and decoding; push phases are recorded as
+# spans. At exit a per-phase breakdown goes to stderr, and with a path a
+# Chrome trace (chrome://tracing, ui.perfetto.dev) is written there.
+# ---------------------------------------------------------------------------
+
+TRACE_ENV = "ANKIPUSH_TRACE"
+
+
+class Tracer:
+    """Request records and phase spans of one process, on a common clock."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.origin = time.perf_counter()
+        self.requests = []  # (phase, label, actions, out, in, t0, t1, t2, t3)
+        self.spans = []  # (name, thread id, start, end)
+        self._local = threading.local()
+
+    def current_phase(self):
+        stack = getattr(self._local, "phases", None)
+        return stack[-1] if stack else "(no phase)"
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        stack = self._local.__dict__.setdefault("phases", [])
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stack.pop()
+            self.spans.append((name, threading.get_ident(), start, time.perf_counter()))
+
+    def request(self, action, params, sent, received, started, encoded, answered):
+        if action == "multi":
+            inner = Counter(a["action"] for a in params["actions"])
+            label = "multi(" + ", ".join(f"{a}×{n}" for a, n in inner.items()) + ")"
+            actions = sum(inner.values())
+        else:
+            label, actions = action, 1
+        self.requests.append(
+            (
+                self.current_phase(),
+                label,
+                actions,
+                sent,
+                received,
+                started,
+                encoded,
+                answered,
+                time.perf_counter(),
+            )
+        )
+
+    def breakdown(self):
+        """Rows of (phase, wall, requests, actions, out, in, encode, anki, decode)."""
+        rows = {}
+
+        def row_for(name):
+            return rows.setdefault(name, [name, 0.0, 0, 0, 0, 0, 0.0, 0.0, 0.0])
+
+        for name, _, start, end in self.spans:
+            row_for(name)[1] += end - start
+        for phase_name, _, actions, sent, got, t0, t1, t2, t3 in self.requests:
+            row = row_for(phase_name)
+            row[2] += 1
+            row[3] += actions
+            row[4] += sent
+            row[5] += got
+            row[6] += t1 - t0
+            row[7] += t2 - t1
+            row[8] += t3 - t2
+        return list(rows.values())
+
+    def report(self, file=sys.stderr):
+        header = [
+            "phase", "wall ms", "reqs", "actions", "KB out", "KB in",
+            "encode ms", "anki ms", "decode ms", "local ms",
+        ]  # fmt: skip
+        rows = []
+        for name, wall, reqs, actions, sent, got, enc, anki, dec in self.breakdown():
+            # local: time in this process outside requests (rendering, diffing)
+            local = max(0.0, wall - enc - anki - dec) if wall else 0.0
+            rows.append(
+                [
+                    name,
+                    f"{wall * 1000:.1f}" if wall else "-",
+                    reqs,
+                    actions,
+                    f"{sent / 1024:.1f}",
+                    f"{got / 1024:.1f}",
+                    f"{enc * 1000:.1f}",
+                    f"{anki * 1000:.1f}",
+                    f"{dec * 1000:.1f}",
+                    f"{local * 1000:.1f}" if wall else "-",
+                ]
+            )
+        widths = [
+            max(len(str(r[i])) for r in [header, *rows]) for i in range(len(header))
+        ]
+        print("ankipush trace:", file=file)
+        for row in [header, *rows]:
+            cells = (str(cell).ljust(width) for cell, width in zip(row, widths))
+            print("  " + "  ".join(cells).rstrip(), file=file)
+
+    def chrome_trace(self):
+        def us(t):
+            return round((t - self.origin) * 1e6, 1)
+
+        pid = os.getpid()
+        events = [
+            {"name": name, "cat": "phase", "ph": "X", "ts": us(start),
+             "dur": round((end - start) * 1e6, 1), "pid": pid, "tid": tid}
+            for name, tid, start, end in self.spans
+        ]  # fmt: skip
+        main_tid = threading.main_thread().ident
+        for phase_name, label, actions, sent, got, t0, t1, t2, t3 in self.requests:
+            events.append(
+                {
+                    "name": label,
+                    "cat": "request",
+                    "ph": "X",
+                    "ts": us(t0),
+                    "dur": round((t3 - t0) * 1e6, 1),
+                    "pid": pid,
+                    "tid": main_tid,
+                    "args": {
+                        "phase": phase_name,
+                        "actions": actions,
+                        "bytes_out": sent,
+                        "bytes_in": got,
+                        "encode_ms": round((t1 - t0) * 1000, 3),
+                        "anki_ms": round((t2 - t1) * 1000, 3),
+                        "decode_ms": round((t3 - t2) * 1000, 3),
+                    },
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def finish(self):
+        self.report()
+        if self.path:
+            with open(self.path, "w", encoding="utf-8") as fh:
+                json.dump(self.chrome_trace(), fh)
+            print(f"  trace written to {self.path}", file=sys.stderr)
+
+
+_tracer = None
+
+
+def enable_tracing(path=None):
+    """Start tracing this process; the report is printed at exit."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(path)
+        atexit.register(_tracer.finish)
+    elif path:
+        _tracer.path = path
+    return _tracer
+
+
+def phase(name):
+    """Attribute the enclosed requests (and wall time) to a named phase."""
+    if _tracer is None:
+        return contextlib.nullcontext()
+    return _tracer.phase(name)
+
+
+if os.environ.get(TRACE_ENV):
+    _value = os.environ[TRACE_ENV]
+    enable_tracing(None if _value in ("1", "true", "yes", "on") else _value)
+
+
+# ---------------------------------------------------------------------------
+# Batching: queue calls and send them as AnkiConnect "multi" requests.
+#   Every invoke() is a blocking round trip on Anki's GUI thread, so loops of
+#   createDeck / changeDeck / findCards are folded into one request each.
+# ---------------------------------------------------------------------------
+
+# Upper bound on actions per "multi" request; keeps single payloads (and the
+# time Anki's GUI thread spends on one request) bounded for very large pushes.
+MULTI_CHUNK = 500
+
+
+class Call:
+    """Handle for one queued action; `.result` is filled in when the batch flushes."""
+
+    __slots__ = ("action", "params", "_result", "_error", "_done")
+
+    def __init__(self, action, params):
+        self.action = action
+        self.params = params
+        self._result = self._error = None
+        self._done = False
+
+    def _resolve(self, item):
+        # With "version": 6 on each inner action, AnkiConnect wraps every
+        # result as {"result": ..., "error": ...}.
+        self._done = True
+        if isinstance(item, dict) and set(item) == {"result", "error"}:
+            self._result, self._error = item["result"], item["error"]
+        else:
+            self._result = item
+
+    @property
+    def result(self):
+        if not self._done:
+            raise RuntimeError(f"'{self.action}' read before its batch was flushed")
+        if self._error is not None:
+            raise RuntimeError(f"AnkiConnect error for '{self.action}': {self._error}")
+        return self._result
+
+
+class Batch:
+    """Collect AnkiConnect calls and send them as few "multi" requests as possible.
+
+    Use as a context manager; queued calls are flushed on a clean exit:
+
+        with Batch() as batch:
+            calls = [batch.add("createDeck", deck=d) for d in decks]
+        ids = [c.result for c in calls]
+
+    Each call's result (or error) is mapped back to its own `Call`, so one bad
+    action does not hide the outcome of the others. A full queue (`chunk`
+    actions) is sent straight away, so streaming producers stay bounded.
+    """
+
+    def __init__(self, chunk=MULTI_CHUNK):
+        self.chunk = chunk
+        self._queue = []
+
+    def add(self, action, **params):
+        call = Call(action, params)
+        self._queue.append(call)
+        if len(self._queue) >= self.chunk:
+            self.flush()  # keep queue memory and request size bounded
+        return call
+
+    def flush(self):
+        queue, self._queue = self._queue, []
+        for start in range(0, len(queue), self.chunk):
+            calls = queue[start : start + self.chunk]
+            actions = [
+                {"action": c.action, "version": 6, "params": c.params} for c in calls
+            ]
+            for call, item in zip(calls, invoke("multi", actions=actions)):
+                call._resolve(item)
+        return queue
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+
 # ---------------------------------------------------------------------------
 # Key rendering: turn a key spec into a row of <kbd> tokens.
 #   - vim notation (contains '<'):  "<leader>sg", "<C-A-l>", "[d"
@@ -77,15 +505,40 @@ def _vim_token_to_chord(token):
     return [token]
 
 
+# Vim notation tokens: a bracketed <…> name, or any single character.
+_TOKEN = re.compile(r"<[^>]+>|.")
+
+# Bound on memoized specs/tokens; far above any real deck, so every distinct
+# binding is rendered once per process and then served from the cache.
+RENDER_CACHE_SIZE = 8192
+
+
+def _kbd_chord(labels):
+    return "+".join(f"<kbd>{label}</kbd>" for label in labels)
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _vim_token_html(token):
+    return _kbd_chord(_vim_token_to_chord(token))
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _desktop_chord_html(chord):
+    return _kbd_chord(_KEYS.get(t.lower(), t) for t in chord.split("+"))
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
 def render_key(spec):
     if "<" in spec:  # vim notation
-        chords = [_vim_token_to_chord(t) for t in re.findall(r"<[^>]+>|.", spec)]
-    else:  # desktop notation
-        chords = [
-            [_KEYS.get(t.lower(), t) for t in chord.split("+")]
-            for chord in spec.split(" ")
-        ]
-    return " ".join("+".join(f"<kbd>{c}</kbd>" for c in chord) for chord in chords)
+        return " ".join(map(_vim_token_html, _TOKEN.findall(spec)))
+    # desktop notation
+    return " ".join(map(_desktop_chord_html, spec.split(" ")))
+
+
+def render_keys(specs):
+    """Render many specs at once; each distinct spec is rendered only once."""
+    rendered = {spec: render_key(spec) for spec in set(specs)}
+    return [rendered[spec] for spec in specs]
 
 
 # ---------------------------------------------------------------------------
@@ -161,118 +614,700 @@ kbd {
 """
 
 
-def ensure_deck_tree(root_deck, categories, subdecks=True):
-    invoke("createDeck", deck=root_deck)
-    if subdecks:
-        for cat in categories:
-            invoke("createDeck", deck=f"{root_deck}::{cat}")
+NOTE_FIELDS = ("Action", "Key", "Mode", "Category", "Notes")
+
+
+def _results(calls):
+    """Read every queued call's result, raising on the first per-call error."""
+    return [call.result for call in calls]
 
 
-def ensure_model(model):
-    fields = ["Action", "Key", "Mode", "Category", "Notes"]
+def _deck_tree(root_deck, categories, subdecks=True):
+    return [root_deck] + (
+        [f"{root_deck}::{cat}" for cat in categories] if subdecks else []
+    )
+
+
+def _queue_model(batch, model, exists):
     template = {"Name": "Recall key", "Front": FRONT, "Back": BACK}
-    if model in invoke("modelNames"):
+    if exists:
         # Refresh styling + template so design edits here apply on re-run.
-        invoke("updateModelStyling", model={"name": model, "css": CSS})
-        invoke(
-            "updateModelTemplates",
-            model={
-                "name": model,
-                "templates": {template["Name"]: {"Front": FRONT, "Back": BACK}},
-            },
+        return [
+            batch.add("updateModelStyling", model={"name": model, "css": CSS}),
+            batch.add(
+                "updateModelTemplates",
+                model={
+                    "name": model,
+                    "templates": {template["Name"]: {"Front": FRONT, "Back": BACK}},
+                },
+            ),
+        ]
+    return [
+        batch.add(
+            "createModel",
+            modelName=model,
+            inOrderFields=list(NOTE_FIELDS),
+            css=CSS,
+            isCloze=False,
+            cardTemplates=[template],
         )
-        return
-    invoke(
-        "createModel",
-        modelName=model,
-        inOrderFields=fields,
-        css=CSS,
-        isCloze=False,
-        cardTemplates=[template],
-    )
+    ]
 
 
 def _tag(category):
     return category.lower().replace(" / ", "-").replace(" & ", "-").replace(" ", "-")
 
 
-def _place_cards(root_deck, model, subdecks=True):
-    """Authoritatively place every card of `model` into its target deck.
+def _search(key, value, suffix=""):
+    """A quoted Anki search term matching `value` literally.
 
-    AnkiConnect's addNotes ignores per-note deckName on some Anki builds (cards
-    land in the GUI's selected deck), so we place them by id. With subdecks the
-    target is root_deck::<Category> (read from the note's field); flat mode puts
-    everything in root_deck. Either way it is idempotent on re-runs.
+    `*` and `_` are wildcards in Anki searches and `"`/`\\` end or escape the
+    quoted term, so all four are backslash-escaped; `suffix` is appended raw
+    (e.g. "::*" to match child decks).
     """
-    note_ids = invoke("findNotes", query=f"note:{model}")
-    if not note_ids:
-        return 0
-    by_deck = defaultdict(list)
-    for info in invoke("notesInfo", notes=note_ids):
-        if subdecks:
-            category = info["fields"]["Category"]["value"]
-            target = f"{root_deck}::{category}"
-        else:
-            target = root_deck
-        by_deck[target].extend(info["cards"])
-    for deck, cards in by_deck.items():
-        invoke("changeDeck", cards=cards, deck=deck)
-    return sum(len(c) for c in by_deck.values())
+    escaped = re.sub(r'([\\"*_])', r"\\\1", value)
+    return f'"{key}:{escaped}{suffix}"'
 
 
-def _delete_empty_subdecks(root_deck):
-    """Remove leftover root_deck::* subdecks that hold no cards (flat mode)."""
-    subdecks = [d for d in invoke("deckNames") if d.startswith(f"{root_deck}::")]
-    empty = [d for d in subdecks if not invoke("findCards", query=f'deck:"{d}"')]
+def _delete_empty_subdecks(root_decks):
+    """Remove leftover <root>::* subdecks that hold no cards (flat decks)."""
+    prefixes = tuple(f"{root}::" for root in root_decks)
+    subdecks = [d for d in invoke("deckNames") if d.startswith(prefixes)]
+    with Batch() as batch:
+        calls = [batch.add("findCards", query=_search("deck", d)) for d in subdecks]
+    empty = [d for d, call in zip(subdecks, calls) if not call.result]
     if empty:
         invoke("deleteDecks", decks=empty, cardsToo=True)
     return empty
 
 
-def push_cards(root_deck, model, cards, subdecks=True):
-    print(f"AnkiConnect v{invoke('version')} reachable ✓")
+# ---------------------------------------------------------------------------
+# Streaming: notes are rendered lazily from the cards, and existing notes are
+# read and written in bounded chunks, so request sizes stay fixed and memory
+# only holds a compact per-note index however large a deck grows.
+# ---------------------------------------------------------------------------
+
+# Notes per notesInfo / addNotes request; override with --chunk-size.
+CHUNK_SIZE = 1000
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
-    categories = sorted({c[0] for c in cards})
-    ensure_deck_tree(root_deck, categories, subdecks=subdecks)
-    ensure_model(model)
 
-    notes = []
-    for category, action, key, mode, notes_txt, source in cards:
-        notes.append(
-            {
+def _progress(label, done, total):
+    """A self-overwriting progress line on stderr (only when it is a terminal)."""
+    if not total or not sys.stderr.isatty():
+        return
+    end = "\n" if done >= total else ""
+    print(f"\r  {label}: {done}/{total}", end=end, file=sys.stderr, flush=True)
+
+
+def _find_notes(models):
+    """Note ids of every model, in one request: {model: [ids]}."""
+    with Batch() as batch:
+        found = {m: batch.add("findNotes", query=_search("note", m)) for m in models}
+    return {m: call.result for m, call in found.items()}
+
+
+def _stream_notes_info(ids_by_model, chunk_size=CHUNK_SIZE):
+    """Yield (model, notesInfo record), reading at most chunk_size notes a request.
+
+    Models that fit in one chunk share it (one notesInfo per model inside a
+    multi), so a few small decks still cost a single round trip.
+    """
+    total = sum(len(ids) for ids in ids_by_model.values())
+    pairs = ((model, nid) for model, ids in ids_by_model.items() for nid in ids)
+    done = 0
+    for chunk in _chunked(pairs, chunk_size):
+        by_model = defaultdict(list)
+        for model, nid in chunk:
+            by_model[model].append(nid)
+        with Batch() as batch:
+            calls = [
+                (model, batch.add("notesInfo", notes=ids))
+                for model, ids in by_model.items()
+            ]
+        for model, call in calls:
+            for info in call.result:
+                yield model, info
+        done += len(chunk)
+        _progress("notesInfo", done, total)
+
+
+def _misplaced_queries(plan):
+    """(target deck, findCards query) pairs matching only wrongly placed cards."""
+    note = _search("note", plan.model)
+    if plan.subdecks:
+        return [
+            (
+                f"{plan.root_deck}::{cat}",
+                f"{note} {_search('Category', cat)} "
+                f"-{_search('deck', f'{plan.root_deck}::{cat}')}",
+            )
+            for cat in plan.categories
+        ]
+    # Flat: anything outside the root deck, or inside one of its subdecks.
+    root = plan.root_deck
+    return [
+        (root, f"{note} -{_search('deck', root)}"),
+        (root, f"{note} {_search('deck', root, suffix='::*')}"),
+    ]
+
+
+def _place_cards(plans, chunk_size=CHUNK_SIZE):
+    """Move the cards of each plan's model that sit outside their target deck.
+
+    AnkiConnect's addNotes ignores per-note deckName on some Anki builds (cards
+    land in the GUI's selected deck), so placement is enforced every push. With
+    subdecks the target is root_deck::<Category>; flat mode puts everything in
+    root_deck. Anki answers one findCards query per target (all in one batch)
+    with only the misplaced cards, so the cost scales with what needs moving,
+    not with deck size.
+    """
+    with Batch() as batch:
+        queries = [
+            (plan, target, batch.add("findCards", query=query))
+            for plan in plans
+            for target, query in _misplaced_queries(plan)
+        ]
+    with Batch() as batch:
+        calls = []
+        for plan, target, found in queries:
+            plan.placed += len(found.result)
+            calls += [
+                batch.add("changeDeck", cards=chunk, deck=target)
+                for chunk in _chunked(found.result, chunk_size)
+            ]
+    _results(calls)
+
+
+# ---------------------------------------------------------------------------
+# Sync engine: diff the desired notes against what the model holds in Anki and
+# apply only the delta. A note's identity is (Category, Action), so editing a
+# card's Key/Mode/Notes updates it in place instead of adding a duplicate.
+# ---------------------------------------------------------------------------
+
+
+def _identity(fields):
+    return fields["Category"], fields["Action"]
+
+
+def _fields_digest(fields):
+    return _digest([fields.get(name, "") for name in NOTE_FIELDS])
+
+
+def _is_managed_tag(tag, root_deck, category_tags):
+    """Tags push_cards owns; anything else (leech, marked, …) is left alone."""
+    return (
+        tag in (root_deck, "keybindings")
+        or tag in category_tags
+        or tag.startswith("src-")
+    )
+
+
+def iter_notes(root_deck, model, cards, subdecks=True):
+    """Yield the AnkiConnect note payload for each card, rendered on demand.
+
+    Keys go through render_keys a chunk of cards at a time, so memory stays
+    bounded however large the deck.
+    """
+    for chunk in _chunked(cards, CHUNK_SIZE):
+        keys = render_keys([card[2] for card in chunk])
+        for (category, action, _, mode, notes_txt, source), key in zip(chunk, keys):
+            yield {
                 "deckName": f"{root_deck}::{category}" if subdecks else root_deck,
                 "modelName": model,
                 "fields": {
                     "Action": action,
-                    "Key": render_key(key),
+                    "Key": key,
                     "Mode": mode,
                     "Category": category,
                     "Notes": notes_txt,
                 },
                 "tags": [root_deck, "keybindings", _tag(category), f"src-{source}"],
-                # Collection-wide dedupe: addNotes ignores deckName on some builds
-                # (we fix placement below), so a per-deck scope would let re-runs
-                # create duplicates.
-                "options": {"allowDuplicate": False, "duplicateScope": "collection"},
+                # The sync engine dedupes on (Category, Action) itself; Anki's
+                # first-field check would wrongly reject the same prompt filed
+                # under two categories.
+                "options": {"allowDuplicate": True},
             }
+
+
+class NoteIndex:
+    """Compact view of a model's existing notes, keyed on card identity.
+
+    Keeps (note id, fields digest, lower-cased tags) per identity instead of
+    whole notesInfo records. Later notes with the same identity (left behind
+    by older pushes, or by an .apkg import over pushed notes) are held as
+    clashes until `settle` picks the one to keep.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.duplicates = []
+        self.clashes = defaultdict(list)  # identity -> further entries
+
+    def add(self, info):
+        fields = {name: f["value"] for name, f in info["fields"].items()}
+        key = _identity(fields)
+        entry = (
+            info["noteId"],
+            _fields_digest(fields),
+            frozenset(t.lower() for t in info["tags"]),
         )
+        if key in self.entries:
+            self.clashes[key].append(entry)
+        else:
+            self.entries[key] = entry
+
+    def clashing(self):
+        """Ids of every note that shares its identity with another."""
+        return [
+            entry[0]
+            for key, others in self.clashes.items()
+            for entry in (self.entries[key], *others)
+        ]
+
+    def settle(self, reviewed=frozenset()):
+        """Keep one note per identity, the rest become duplicates to delete.
+
+        A note in `reviewed` wins over a new one, since it holds the review
+        history; otherwise the oldest (lowest id) is kept.
+        """
+        for key, others in self.clashes.items():
+            keep, *drop = sorted(
+                (self.entries[key], *others), key=lambda e: (e[0] not in reviewed, e[0])
+            )
+            self.entries[key] = keep
+            self.duplicates += [entry[0] for entry in drop]
+        self.clashes.clear()
+
+
+def _reviewed_notes(note_ids, chunk_size=CHUNK_SIZE):
+    """The subset of `note_ids` with a card that has been studied."""
+    with Batch() as batch:
+        calls = [
+            batch.add("findNotes", query=f"nid:{','.join(map(str, chunk))} -is:new")
+            for chunk in _chunked(note_ids, chunk_size)
+        ]
+    return {nid for call in calls for nid in call.result}
+
+
+def _queue_sync(batch, plan, index, chunk_size=CHUNK_SIZE):
+    """Queue the writes that turn `index` into the plan's notes.
+
+    The plan's notes are streamed once; new ones go out as addNotes chunks of
+    at most chunk_size. Consumes `index`. Returns (calls, counts).
+    """
+    root_tag = plan.root_deck.lower()
+    category_tags = {_tag(c) for c in plan.categories}
+    category_tags |= {_tag(category) for category, _ in index.entries}
+
+    calls, adds, seen = [], [], set()
+    tag_adds, tag_removes = defaultdict(list), defaultdict(list)
+    counts = dict.fromkeys(COUNT_KEYS, 0)
+    retagged = set()
+
+    for done, note in enumerate(plan.notes(), 1):
+        if done % chunk_size == 0:
+            _progress(f"sync {plan.root_deck}", done, plan.count)
+        key = _identity(note["fields"])
+        if key in seen:
+            continue  # same card listed twice in cards.py; first one wins
+        seen.add(key)
+        entry = index.entries.pop(key, None)
+        if entry is None:
+            adds.append(note)
+            counts["added"] += 1
+            if len(adds) == chunk_size:
+                calls.append(batch.add("addNotes", notes=adds))
+                batch.flush()  # one bounded addNotes payload per request
+                adds = []
+            continue
+        note_id, digest, have = entry
+        changed = digest != _fields_digest(note["fields"])
+        if changed:
+            update = {"id": note_id, "fields": note["fields"]}
+            calls.append(batch.add("updateNoteFields", note=update))
+            counts["updated"] += 1
+        want = {t.lower() for t in note["tags"]}
+        stale = {
+            t for t in have - want if _is_managed_tag(t, root_tag, category_tags)
+        }
+        for tag in want - have:
+            tag_adds[tag].append(note_id)
+        for tag in stale:
+            tag_removes[tag].append(note_id)
+        if want - have or stale:
+            retagged.add(note_id)
+        elif not changed:
+            counts["unchanged"] += 1
+    _progress(f"sync {plan.root_deck}", plan.count, plan.count)
+
+    if adds:
+        calls.append(batch.add("addNotes", notes=adds))
+    for action, tags in (("addTags", tag_adds), ("removeTags", tag_removes)):
+        for tag, ids in tags.items():
+            calls += [
+                batch.add(action, notes=chunk, tags=tag)
+                for chunk in _chunked(ids, chunk_size)
+            ]
+    deletes = index.duplicates + [entry[0] for entry in index.entries.values()]
+    calls += [batch.add("deleteNotes", notes=c) for c in _chunked(deletes, chunk_size)]
+    counts["retagged"] = len(retagged)
+    counts["deleted"] = len(deletes)
+    return calls, counts
+
+
+# ---------------------------------------------------------------------------
+# Manifest: content hashes of what the last successful push sent, per deck,
+# under $XDG_CACHE_HOME/ankipush/. Parts whose hash is unchanged are skipped,
+# so a re-run of an untouched deck never contacts Anki at all.
+# ---------------------------------------------------------------------------
+
+MANIFEST_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "ankipush",
+    "manifest.json",
+)
+
+
+def _digest(obj):
+    blob = json.dumps(obj, sort_keys=True, ensure_ascii=False).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+def load_manifest(path=None):
+    try:
+        with open(path or MANIFEST_PATH, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path=None):
+    path = path or MANIFEST_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _stream_digest(items):
+    """_digest over an iterable without materializing it."""
+    sha = hashlib.sha256()
+    for item in items:
+        sha.update(json.dumps(item, sort_keys=True, ensure_ascii=False).encode())
+        sha.update(b"\n")
+    return sha.hexdigest()
+
+
+def deck_hashes(root_deck, model, categories, notes, subdecks=True):
+    """Hashes of the three independently pushed parts of a deck.
+
+    `notes` may be any iterable (e.g. iter_notes); it is consumed once.
+    """
+    return {
+        "layout": _digest([root_deck, subdecks, categories]),
+        "model": _digest([model, FRONT, BACK, CSS]),
+        "notes": _stream_digest(itertools.chain([model], notes)),
+    }
+
 
-    addable = invoke("canAddNotes", notes=notes)
-    new_notes = [n for n, ok in zip(notes, addable) if ok]
-    if new_notes:
-        invoke("addNotes", notes=new_notes)
+# ---------------------------------------------------------------------------
+# Push pipeline. Every deck is prepared offline into a DeckPlan; push_decks then
+# runs each phase (deck tree, note type, sync, placement, cleanup) for all decks
+# at once, so pushing N decks costs the same handful of requests as pushing one.
+# ---------------------------------------------------------------------------
+
+COUNT_KEYS = ("added", "updated", "retagged", "deleted", "unchanged")
+
+
+class DeckPlan:
+    """A deck's cards and content hashes, prepared without touching Anki.
+
+    Notes are not kept in memory; `notes()` re-renders them on demand (cheap,
+    render_key is memoized) for each pass that needs them.
+    """
+
+    def __init__(self, root_deck, model, cards, subdecks=True):
+        started = time.perf_counter()
+        self.root_deck = root_deck
+        self.model = model
+        self.subdecks = subdecks
+        self.cards = cards
+        self.count = len(cards)
+        self.categories = sorted({c[0] for c in cards})
+        with phase("prepare"):
+            self.hashes = deck_hashes(
+                root_deck, model, self.categories, self.notes(), subdecks=subdecks
+            )
+        self.stale = set()
+        self.counts = None
+        self.placed = 0
+        self.prep_seconds = time.perf_counter() - started
+
+    def notes(self):
+        return iter_notes(self.root_deck, self.model, self.cards, self.subdecks)
+
+
+def shared_models(plans):
+    """{model: [root decks]} for every note type more than one plan uses.
+
+    A deck owns every note of its model: syncing one deck would delete the
+    other's notes as stale, so each deck needs a MODEL of its own.
+    """
+    decks = defaultdict(list)
+    for plan in plans:
+        decks[plan.model].append(plan.root_deck)
+    return {model: roots for model, roots in decks.items() if len(roots) > 1}
+
+
+def push_decks(plans, force=False, chunk_size=CHUNK_SIZE):
+    """Push every DeckPlan over the shared connection with merged batches."""
+    shared = shared_models(plans)
+    if shared:
+        model, roots = next(iter(shared.items()))
+        raise ValueError(f"decks {', '.join(roots)} share the note type '{model}'")
+    started, requests = time.perf_counter(), transport().requests
+    manifest = load_manifest()
+    for plan in plans:
+        previous = {} if force else manifest.get(plan.root_deck, {})
+        plan.stale = {
+            part for part, digest in plan.hashes.items() if previous.get(part) != digest
+        }
+    todo = [plan for plan in plans if plan.stale]
+    removed = []
 
-    moved = _place_cards(root_deck, model, subdecks=subdecks)
-    removed = [] if subdecks else _delete_empty_subdecks(root_deck)
+    if todo:
+        with phase("deck tree"), Batch() as batch:
+            version = batch.add("version")
+            model_names = batch.add("modelNames")
+            tree = [
+                batch.add("createDeck", deck=deck)
+                for plan in todo
+                if "layout" in plan.stale
+                for deck in _deck_tree(plan.root_deck, plan.categories, plan.subdecks)
+            ]
+        print(f"AnkiConnect v{version.result} reachable ✓")
+        _results(tree)
 
-    print(
-        f"Total cards: {len(notes)}  |  added: {len(new_notes)}  |  already present: {len(notes) - len(new_notes)}"
+        existing_models = set(model_names.result)
+        with phase("model"), Batch() as batch:
+            calls = [
+                call
+                for plan in todo
+                if "model" in plan.stale
+                for call in _queue_model(
+                    batch, plan.model, plan.model in existing_models
+                )
+            ]
+        _results(calls)
+
+        syncing = [plan for plan in todo if "notes" in plan.stale]
+        with phase("index"):
+            indexes = {plan.model: NoteIndex() for plan in syncing}
+            ids = _find_notes(list(indexes))
+            for model, info in _stream_notes_info(ids, chunk_size):
+                indexes[model].add(info)
+            # Only when duplicates exist: which copies hold review history
+            clashing = [nid for index in indexes.values() for nid in index.clashing()]
+            reviewed = _reviewed_notes(clashing, chunk_size) if clashing else set()
+            for index in indexes.values():
+                index.settle(reviewed)
+        with phase("sync"), Batch() as batch:
+            calls = []
+            for plan in syncing:
+                queued, plan.counts = _queue_sync(
+                    batch, plan, indexes.pop(plan.model), chunk_size
+                )
+                calls += queued
+        _results(calls)
+
+        with phase("place"):
+            placing = [plan for plan in todo if plan.stale & {"layout", "notes"}]
+            _place_cards(placing, chunk_size)
+
+        flat = [p.root_deck for p in todo if not p.subdecks and "layout" in p.stale]
+        if flat:
+            with phase("cleanup"):
+                removed = _delete_empty_subdecks(flat)
+
+        with phase("manifest"):
+            for plan in todo:
+                manifest[plan.root_deck] = plan.hashes
+            save_manifest(manifest)
+
+    _print_summary(
+        plans, removed, time.perf_counter() - started, transport().requests - requests
     )
-    if subdecks:
-        layout = f"subdecks: {', '.join(categories)}"
-    else:
-        layout = "flat (one deck; category kept as tag/badge)"
-    print(f"Deck: '{root_deck}' ({layout})  |  cards placed: {moved}")
+
+
+def _print_summary(plans, removed, seconds, requests):
+    header = ["deck", "cards", *COUNT_KEYS, "moved", "pushed", "prep ms"]
+    rows = []
+    for plan in plans:
+        counts = plan.counts or {}
+        pushed = ",".join(sorted(plan.stale)) if plan.stale else "skipped"
+        rows.append(
+            [
+                plan.root_deck,
+                plan.count,
+                *(counts.get(key, "-") for key in COUNT_KEYS),
+                plan.placed,
+                pushed,
+                f"{plan.prep_seconds * 1000:.1f}",
+            ]
+        )
+    widths = [max(len(str(r[i])) for r in [header, *rows]) for i in range(len(header))]
+    for row in [header, *rows]:
+        cells = (str(cell).ljust(width) for cell, width in zip(row, widths))
+        print("  ".join(cells).rstrip())
+    print(f"Push finished in {seconds * 1000:.0f} ms over {requests} request(s)")
     if removed:
         print(f"Removed {len(removed)} empty subdeck(s): {', '.join(removed)}")
+    if any(not plan.stale for plan in plans):
+        print("Skipped decks are unchanged since the last push; --force pushes anyway.")
     print("Tip: sync from the Anki desktop app to push these up to AnkiWeb.")
+
+
+def push_cards(
+    root_deck, model, cards, subdecks=True, force=False, chunk_size=CHUNK_SIZE
+):
+    plan = DeckPlan(root_deck, model, cards, subdecks=subdecks)
+    push_decks([plan], force=force, chunk_size=chunk_size)
+
+
+# ---------------------------------------------------------------------------
+# CLI: push every deck folder next to this file in one session.
+#   python3 anki/ankipush.py [--force] [--check] [--apkg PATH] [--bulk-import]
+#                            [deck ...]
+# ---------------------------------------------------------------------------
+
+ANKI_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def discover_decks(base=ANKI_DIR):
+    """Paths of every <deck>/cards.py under `base`, sorted by deck folder."""
+    return sorted(glob.glob(os.path.join(base, "*", "cards.py")))
+
+
+def import_cards(path):
+    """Import a deck's cards.py as a module named after its folder."""
+    name = os.path.basename(os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(f"ankipush_cards_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_deck(path):
+    """Import a deck's cards.py and turn it into a DeckPlan."""
+    started = time.perf_counter()
+    name = os.path.basename(os.path.dirname(path))
+    module = import_cards(path)
+    cards = module.CARDS
+    if getattr(module, "SOURCES", None):
+        import extract  # parses the config files the deck mirrors
+
+        cards = extract.deck_cards(module)
+    plan = DeckPlan(
+        getattr(module, "ROOT_DECK", name),
+        getattr(module, "MODEL", f"{name}-keybind"),
+        cards,
+        subdecks=getattr(module, "SUBDECKS", True),
+    )
+    plan.prep_seconds = time.perf_counter() - started  # include the import
+    return plan
+
+
+def push_parser(description):
+    """Argument parser with the options every push entry point takes."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--force", action="store_true", help="ignore the manifest and push everything"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help="notes per notesInfo/addNotes request (default: %(default)s)",
+    )
+    return parser
+
+
+def main(argv=None):
+    parser = push_parser("Push the keybinding decks to Anki.")
+    parser.add_argument("decks", nargs="*", help="deck folders to push (default: all)")
+    parser.add_argument(
+        "--apkg",
+        metavar="PATH",
+        help="write the decks to an .apkg package instead of pushing (no Anki needed)",
+    )
+    parser.add_argument(
+        "--bulk-import",
+        action="store_true",
+        help="load the decks with one importPackage call instead of syncing notes",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="report key conflicts and shadowed prefixes first; stop on conflicts",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help=f"print per-phase request timings at exit (or set {TRACE_ENV}=1)",
+    )
+    parser.add_argument(
+        "--trace-file",
+        metavar="PATH",
+        help="trace, and also write a Chrome trace (JSON) to PATH",
+    )
+    args = parser.parse_args(argv)
+    if args.trace or args.trace_file:
+        enable_tracing(args.trace_file)
+
+    paths = discover_decks()
+    if args.decks:
+        wanted = set(args.decks)
+        paths = [p for p in paths if os.path.basename(os.path.dirname(p)) in wanted]
+        missing = wanted - {os.path.basename(os.path.dirname(p)) for p in paths}
+        if missing:
+            parser.error(f"no cards.py for: {', '.join(sorted(missing))}")
+
+    with concurrent.futures.ThreadPoolExecutor() as pool:
+        plans = list(pool.map(load_deck, paths))
+    for model, roots in shared_models(plans).items():
+        parser.error(f"decks {', '.join(roots)} share MODEL '{model}'")
+    if args.check:
+        import conflicts
+
+        if not conflicts.check(plans):
+            sys.exit("Key conflicts found (see above); not pushing.")
+    if args.apkg or args.bulk_import:
+        import apkg  # sqlite3/zipfile are only needed on this path
+
+        if args.bulk_import:
+            apkg.import_decks(plans, args.apkg)
+        else:
+            with phase("build apkg"):
+                notes = apkg.build_apkg(plans, args.apkg)
+            print(f"Wrote {notes} notes from {len(plans)} deck(s) to {args.apkg}")
+        return
+    push_decks(plans, force=args.force, chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    # apkg, extract and conflicts import "ankipush"; hand them this module so
+    # they share one transport, manifest and tracer instead of a second copy
+    sys.modules.setdefault("ankipush", sys.modules[__name__])
+    main()
@@ -0,0 +1,370 @@
+"""Build the keybinding decks into an Anki .apkg package, offline.
+
+The package holds the same note type (FRONT/BACK/CSS), decks, fields and tags
+a regular push creates, written straight into a collection database with
+stdlib sqlite3/zipfile, so no Anki is needed to build it (e.g. in CI):
+
+    python3 anki/ankipush.py --apkg keybindings.apkg   # write the package
+    python3 anki/ankipush.py --bulk-import             # + one importPackage
+
+Note GUIDs are derived from each card's identity (deck, model, category,
+action), so importing a newer package updates the notes it imported before
+instead of duplicating them; note type and deck ids are likewise stable.
+Note and card ids come from the clock, as in Anki itself, so "Added" dates
+are real. Notes first added over AnkiConnect carry random GUIDs, so importing
+over them leaves a second copy: `import_decks` therefore syncs every deck that
+already had notes right after the import, which deletes the imported copy of
+each (Category, Action) and keeps the note with the review history.
+"""
+
+import base64
+import hashlib
+import itertools
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import zipfile
+
+import ankipush
+
+# ---------------------------------------------------------------------------
+# Collection schema (legacy "collection.anki2", schema 11): the format every
+# Anki release since 2.1 still imports.
+# ---------------------------------------------------------------------------
+
+SCHEMA = """
+CREATE TABLE col (
+    id integer primary key, crt integer not null, mod integer not null,
+    scm integer not null, ver integer not null, dty integer not null,
+    usn integer not null, ls integer not null, conf text not null,
+    models text not null, decks text not null, dconf text not null,
+    tags text not null
+);
+CREATE TABLE notes (
+    id integer primary key, guid text not null, mid integer not null,
+    mod integer not null, usn integer not null, tags text not null,
+    flds text not null, sfld integer not null, csum integer not null,
+    flags integer not null, data text not null
+);
+CREATE TABLE cards (
+    id integer primary key, nid integer not null, did integer not null,
+    ord integer not null, mod integer not null, usn integer not null,
+    type integer not null, queue integer not null, due integer not null,
+    ivl integer not null, factor integer not null, reps integer not null,
+    lapses integer not null, left integer not null, odue integer not null,
+    odid integer not null, flags integer not null, data text not null
+);
+CREATE TABLE revlog (
+    id integer primary key, cid integer not null, usn integer not null,
+    ease integer not null, ivl integer not null, lastIvl integer not null,
+    factor integer not null, time integer not null, type integer not null
+);
+CREATE TABLE graves (
+    usn integer not null, oid integer not null, type integer not null
+);
+CREATE INDEX ix_notes_usn on notes (usn);
+CREATE INDEX ix_cards_usn on cards (usn);
+CREATE INDEX ix_revlog_usn on revlog (usn);
+CREATE INDEX ix_cards_nid on cards (nid);
+CREATE INDEX ix_cards_sched on cards (did, queue, due);
+CREATE INDEX ix_revlog_cid on revlog (cid);
+CREATE INDEX ix_notes_csum on notes (csum);
+"""
+
+# Anki's stock "Default" deck options (id 1), which every deck here uses.
+DECK_CONFIG = {
+    "id": 1,
+    "name": "Default",
+    "mod": 0,
+    "usn": 0,
+    "maxTaken": 60,
+    "autoplay": True,
+    "timer": 0,
+    "replayq": True,
+    "dyn": False,
+    "new": {
+        "bury": False,
+        "delays": [1.0, 10.0],
+        "initialFactor": 2500,
+        "ints": [1, 4, 0],
+        "order": 1,
+        "perDay": 20,
+    },
+    "lapse": {
+        "delays": [10.0],
+        "leechAction": 1,
+        "leechFails": 8,
+        "minInt": 1,
+        "mult": 0.0,
+    },
+    "rev": {
+        "bury": False,
+        "ease4": 1.3,
+        "ivlFct": 1.0,
+        "maxIvl": 36500,
+        "perDay": 200,
+        "hardFactor": 1.2,
+    },
+}
+
+# ---------------------------------------------------------------------------
+# Stable ids. Anki matches imported notes on GUID and note types/decks on id,
+# so those are derived from names rather than the clock.
+# ---------------------------------------------------------------------------
+
+
+def _hash_int(*parts):
+    blob = "\x1f".join(parts).encode()
+    return int.from_bytes(hashlib.sha256(blob).digest()[:8], "big")
+
+
+def stable_id(*parts):
+    """A positive id in the millisecond-timestamp range Anki itself uses."""
+    return 1_000_000_000_000 + _hash_int(*parts) % 1_000_000_000_000
+
+
+def note_guid(root_deck, model, fields):
+    """GUID for a note: same card identity, same GUID, on every build."""
+    category, action = ankipush._identity(fields)
+    digest = hashlib.sha256(
+        "\x1f".join(("ankipush", root_deck, model, category, action)).encode()
+    ).digest()
+    return base64.b85encode(digest[:10]).decode()
+
+
+def _checksum(text):
+    """Anki's first-field checksum: sha1 of the HTML-stripped field."""
+    plain = re.sub(r"<[^>]*>", "", text)
+    return int(hashlib.sha1(plain.encode()).hexdigest()[:8], 16)
+
+
+# ---------------------------------------------------------------------------
+# Building
+# ---------------------------------------------------------------------------
+
+
+def _model_json(name, model_id, deck_id, mod):
+    return {
+        "id": model_id,
+        "name": name,
+        "type": 0,
+        "mod": mod,
+        "usn": -1,
+        "sortf": 0,
+        "did": deck_id,
+        "tmpls": [
+            {
+                "name": "Recall key",
+                "ord": 0,
+                "qfmt": ankipush.FRONT,
+                "afmt": ankipush.BACK,
+                "bqfmt": "",
+                "bafmt": "",
+                "did": None,
+                "bfont": "",
+                "bsize": 0,
+            }
+        ],
+        "flds": [
+            {
+                "name": field,
+                "ord": i,
+                "sticky": False,
+                "rtl": False,
+                "font": "Arial",
+                "size": 20,
+                "media": [],
+            }
+            for i, field in enumerate(ankipush.NOTE_FIELDS)
+        ],
+        "css": ankipush.CSS,
+        "latexPre": "",
+        "latexPost": "",
+        "latexsvg": False,
+        "req": [[0, "any", [0]]],
+        "tags": [],
+        "vers": [],
+    }
+
+
+def _deck_json(name, deck_id, mod):
+    return {
+        "id": deck_id,
+        "name": name,
+        "mod": mod,
+        "usn": -1,
+        "desc": "",
+        "dyn": 0,
+        "conf": 1,
+        "collapsed": False,
+        "browserCollapsed": False,
+        "extendNew": 0,
+        "extendRev": 0,
+        "newToday": [0, 0],
+        "revToday": [0, 0],
+        "lrnToday": [0, 0],
+        "timeToday": [0, 0],
+    }
+
+
+def build_apkg(plans, path, model_ids=None, deck_ids=None):
+    """Write every DeckPlan into one .apkg at `path`; returns the note count.
+
+    `model_ids` / `deck_ids` map names to ids that should be reused (e.g. the
+    ones a live Anki already has, so an import merges into them); anything
+    else gets a stable id derived from its name.
+    """
+    model_ids = dict(model_ids or {})
+    deck_ids = dict(deck_ids or {})
+    mod = int(time.time())
+    # Note and card ids are creation times in ms, like the ones Anki assigns
+    ids = itertools.count(int(time.time() * 1000))
+    models, decks = {}, {"1": _deck_json("Default", 1, mod)}
+    notes = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "collection.anki2")
+        db = sqlite3.connect(db_path)
+        db.executescript(SCHEMA)
+        for plan in plans:
+            for deck in ankipush._deck_tree(
+                plan.root_deck, plan.categories, plan.subdecks
+            ):
+                deck_id = deck_ids.setdefault(deck, stable_id("deck", deck))
+                decks[str(deck_id)] = _deck_json(deck, deck_id, mod)
+            model_id = model_ids.setdefault(plan.model, stable_id("model", plan.model))
+            models[str(model_id)] = _model_json(
+                plan.model, model_id, deck_ids[plan.root_deck], mod
+            )
+
+            note_rows, card_rows, seen = [], [], set()
+            for note in plan.notes():
+                fields = note["fields"]
+                if ankipush._identity(fields) in seen:
+                    continue  # same card listed twice; first one wins, as in sync
+                seen.add(ankipush._identity(fields))
+                guid = note_guid(plan.root_deck, plan.model, fields)
+                note_id = next(ids)
+                values = [fields[name] for name in ankipush.NOTE_FIELDS]
+                note_rows.append(
+                    (
+                        note_id,
+                        guid,
+                        model_id,
+                        mod,
+                        -1,
+                        " " + " ".join(note["tags"]) + " ",
+                        "\x1f".join(values),
+                        values[0],
+                        _checksum(values[0]),
+                        0,
+                        "",
+                    )
+                )
+                card_rows.append(
+                    (
+                        next(ids),
+                        note_id,
+                        deck_ids[note["deckName"]],
+                        0,
+                        mod,
+                        -1,
+                        0,
+                        0,
+                        len(seen),
+                        0,
+                        0,
+                        0,
+                        0,
+                        0,
+                        0,
+                        0,
+                        0,
+                        "",
+                    )
+                )
+            db.executemany(
+                "INSERT INTO notes VALUES (?,?,?,?,?,?,?,?,?,?,?)", note_rows
+            )
+            db.executemany(
+                "INSERT INTO cards VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                card_rows,
+            )
+            notes += len(note_rows)
+
+        conf = {"nextPos": notes + 1, "curDeck": 1, "curModel": None}
+        db.execute(
+            "INSERT INTO col VALUES (1,?,?,?,11,0,0,0,?,?,?,?,?)",
+            (
+                mod,
+                mod * 1000,
+                mod * 1000,
+                json.dumps(conf),
+                json.dumps(models),
+                json.dumps(decks),
+                json.dumps({"1": DECK_CONFIG}),
+                "{}",
+            ),
+        )
+        db.commit()
+        db.close()
+
+        part = f"{path}.{os.getpid()}.tmp"
+        with zipfile.ZipFile(part, "w", zipfile.ZIP_DEFLATED) as package:
+            package.write(db_path, "collection.anki2")
+            package.writestr("media", "{}")
+        os.replace(part, path)
+    return notes
+
+
+# ---------------------------------------------------------------------------
+# Importing: one importPackage call instead of a sync per note.
+# ---------------------------------------------------------------------------
+
+
+def import_decks(plans, path=None):
+    """Build a package and import it into the running Anki in one call.
+
+    Existing note type and deck ids are reused so the import merges into
+    them. Decks that had no notes yet are recorded in the manifest as after a
+    push. Decks that did are pushed right after the import, since notes a
+    push added carry other GUIDs and now have an imported twin; that sync
+    deletes the twins and records the manifest.
+    """
+    started, requests = time.perf_counter(), ankipush.transport().requests
+    with ankipush.phase("ids"), ankipush.Batch() as batch:
+        models = batch.add("modelNamesAndIds")
+        decks = batch.add("deckNamesAndIds")
+        existing = {
+            plan.root_deck: batch.add(
+                "findNotes", query=ankipush._search("note", plan.model)
+            )
+            for plan in plans
+        }
+    with tempfile.TemporaryDirectory() as tmp:
+        target = os.path.abspath(path or os.path.join(tmp, "ankipush.apkg"))
+        with ankipush.phase("build apkg"):
+            notes = build_apkg(plans, target, models.result, decks.result)
+        with ankipush.phase("import"):
+            ankipush.invoke("importPackage", path=target)
+
+    manifest = ankipush.load_manifest()
+    resync = [plan for plan in plans if existing[plan.root_deck].result]
+    for plan in plans:
+        hashes = dict(plan.hashes)
+        if plan in resync:
+            hashes["notes"] = None  # layout and note type are in place
+        manifest[plan.root_deck] = hashes
+    ankipush.save_manifest(manifest)
+    seconds = time.perf_counter() - started
+    requests = ankipush.transport().requests - requests
+    print(
+        f"Imported {notes} notes from {len(plans)} deck(s) in {seconds * 1000:.0f} ms"
+        f" over {requests} request(s)"
+    )
+    if resync:
+        print(f"Syncing {len(resync)} deck(s) that already had notes:")
+        ankipush.push_decks(resync)
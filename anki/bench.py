@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""Benchmark ankipush against the in-process fake AnkiConnect server.
+
+Pushes synthetic keybinding decks (100 to 50k cards by default) through the
+real push pipeline and a FakeAnkiConnect server, and records, per deck size and
+scenario, the wall time, round trips and bytes on the wire:
+
+  initial — push into an empty collection (everything added)
+  noop    — forced re-push with nothing changed (diff finds no work)
+  edit    — forced re-push after editing 1% of the cards
+  cached  — plain re-push; the manifest should skip Anki entirely
+  async   — three AnkiConnectAsync.snapshot() reads over its connection pool
+
+`--close-after` makes the fake drop the connection after every response, as
+the real add-on does, so both clients' reconnect paths are measured too.
+
+Results go to a JSON file so two revisions can be compared:
+
+    python3 anki/bench.py --output before.json
+    git switch my-branch
+    python3 anki/bench.py --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ankipush  # noqa: E402
+from ankiasync import AnkiConnectAsync  # noqa: E402
+from fakeconnect import FakeAnkiConnect  # noqa: E402
+
+SIZES = (100, 1_000, 10_000, 50_000)
+SCENARIOS = ("initial", "noop", "edit", "cached", "async")
+
+_LEADER_KEYS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ/.,"
+_DESKTOP_MODS = ("Super", "Super+Shift", "Super+Ctrl", "Alt", "Ctrl+Alt")
+_DESKTOP_KEYS = ("Left", "Right", "Up", "Down", "Tab", "Space", "A", "B", "1", "F11")
+
+
+def synthetic_cards(count, seed=0):
+    """`count` unique (category, action, key, mode, notes, source) tuples."""
+    rnd = random.Random(seed)
+    categories = [f"Category {i:03d}" for i in range(max(1, count // 100))]
+    cards = []
+    for i in range(count):
+        if rnd.random() < 0.7:
+            key = "<leader>" + "".join(rnd.choices(_LEADER_KEYS, k=rnd.randint(1, 3)))
+        elif rnd.random() < 0.5:
+            key = f"<C-{rnd.choice('AS')}-{rnd.choice(_LEADER_KEYS)}>"
+        else:
+            key = f"{rnd.choice(_DESKTOP_MODS)}+{rnd.choice(_DESKTOP_KEYS)}"
+        cards.append(
+            (
+                rnd.choice(categories),
+                f"Synthetic action #{i}",
+                key,
+                rnd.choice(("Normal", "Visual", "Normal/Visual", "Prefix")),
+                f"Generated note {rnd.getrandbits(32):08x}",
+                "bench",
+            )
+        )
+    return cards
+
+
+def _edit(cards, fraction, seed=1):
+    rnd = random.Random(seed)
+    edited = list(cards)
+    for i in rnd.sample(range(len(cards)), max(1, int(len(cards) * fraction))):
+        edited[i] = edited[i][:4] + (edited[i][4] + " (edited)",) + edited[i][5:]
+    return edited
+
+
+def _measure(server, cards, force):
+    server.reset_stats()
+    started = time.perf_counter()
+    plan = ankipush.DeckPlan("bench", "bench-keybind", cards, subdecks=True)
+    prepared = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ankipush.push_decks([plan], force=force)
+    finished = time.perf_counter()
+    stats = server.stats()
+    return {
+        "seconds": round(finished - started, 6),
+        "prep_seconds": round(prepared - started, 6),
+        "push_seconds": round(finished - prepared, 6),
+        "requests": stats["requests"],
+        "bytes_in": stats["bytes_in"],
+        "bytes_out": stats["bytes_out"],
+        "actions": stats["actions"],
+    }
+
+
+def _measure_async(server, snapshots=3):
+    async def read():
+        async with AnkiConnectAsync(url=server.url, read_timeout=600) as anki:
+            for _ in range(snapshots):
+                await anki.snapshot(["bench-keybind"])
+
+    server.reset_stats()
+    started = time.perf_counter()
+    asyncio.run(read())
+    seconds = time.perf_counter() - started
+    stats = server.stats()
+    return {
+        "seconds": round(seconds, 6),
+        "requests": stats["requests"],
+        "bytes_in": stats["bytes_in"],
+        "bytes_out": stats["bytes_out"],
+        "actions": stats["actions"],
+    }
+
+
+def bench_size(count, latency, close_after=False):
+    """Run every scenario for one deck size against a fresh fake collection."""
+    server = FakeAnkiConnect(latency=latency, close_after=close_after).start()
+    ankipush._transport = ankipush.Transport(url=server.url, read_timeout=600)
+    cards = synthetic_cards(count)
+    try:
+        with tempfile.TemporaryDirectory() as cache:
+            ankipush.MANIFEST_PATH = os.path.join(cache, "manifest.json")
+            return {
+                "initial": _measure(server, cards, force=True),
+                "noop": _measure(server, cards, force=True),
+                "edit": _measure(server, _edit(cards, 0.01), force=True),
+                "cached": _measure(server, _edit(cards, 0.01), force=False),
+                "async": _measure_async(server),
+            }
+    finally:
+        ankipush.transport().close()
+        server.stop()
+
+
+def _revision():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _print_table(results, baseline=None):
+    header = ["cards", "scenario", "ms", "requests", "bytes in", "bytes out"]
+    if baseline:
+        header.append("vs baseline")
+    rows = []
+    for size, scenarios in results.items():
+        for name, m in scenarios.items():
+            row = [
+                size,
+                name,
+                f"{m['seconds'] * 1000:.1f}",
+                m["requests"],
+                m["bytes_in"],
+                m["bytes_out"],
+            ]
+            if baseline:
+                old = baseline.get(size, {}).get(name)
+                if old and old["seconds"]:
+                    row.append(f"{m['seconds'] / old['seconds']:.2f}x time")
+                else:
+                    row.append("-")
+            rows.append(row)
+    widths = [max(len(str(r[i])) for r in [header, *rows]) for i in range(len(header))]
+    for row in [header, *rows]:
+        cells = (str(cell).ljust(width) for cell, width in zip(row, widths))
+        print("  ".join(cells).rstrip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ankipush pushes.")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, SIZES)),
+        help="comma-separated deck sizes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=0.0,
+        help="latency the fake server adds to every request",
+    )
+    parser.add_argument(
+        "--close-after",
+        action="store_true",
+        help="have the fake close the connection after every response",
+    )
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = {}
+    for size in sizes:
+        print(f"benchmarking {size} cards…", file=sys.stderr)
+        results[str(size)] = bench_size(
+            size, args.latency_ms / 1000, args.close_after
+        )
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)["results"]
+    _print_table(results, baseline)
+
+    if args.output:
+        report = {
+            "revision": _revision(),
+            "python": platform.python_version(),
+            "latency_ms": args.latency_ms,
+            "close_after": args.close_after,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+        print(f"wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
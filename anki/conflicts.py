@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Find colliding and shadowed keybindings across every deck.
+
+Each card's key is tokenized with render_key's grammar (vim notation for the
+nvim modes, space-separated desktop chords for everything else) into a chord
+sequence, and stored in one chord trie per scope: where the keys are read,
+e.g. "nvim normal", "tmux prefix", "desktop". Card modes map to scopes (a
+"Normal/Visual" card is in both nvim scopes). Chords are canonical, so
+`<C-h>`, `Ctrl+h` and tmux's `C-h` meet in the same node.
+
+Reported, each in time proportional to the key length per binding:
+
+  conflict  two bindings with the same keys in the same scope
+  prefix    a binding whose keys begin a longer one in the same scope
+            (vim then waits 'timeoutlen' before firing the short one)
+  shadowed  an outer scope binds a prefix of the keys first: COSMIC sees
+            keys before tmux, tmux's root table before any terminal program
+
+    python3 anki/conflicts.py                      # report; exit 1 on conflicts
+    python3 anki/conflicts.py --free "<leader>g"   # free keys after <leader>g
+    python3 anki/conflicts.py --lookup "<C-h>"     # what <C-h> does, per scope
+    python3 anki/ankipush.py --check               # refuse to push conflicts
+"""
+
+import argparse
+import functools
+import string
+import sys
+import time
+
+import ankipush
+
+# Card mode -> scope. Modes not listed get a scope of their own name.
+SCOPES = {
+    "COSMIC": "desktop",
+    "Custom": "desktop",
+    "Core": "tmux",
+    "Root": "tmux",
+    "Prefix": "tmux prefix",
+    "Copy mode": "tmux copy mode",
+    "Normal": "nvim normal",
+    "Visual": "nvim visual",
+    "Select": "nvim select",
+    "Operator": "nvim operator",
+    "Insert": "nvim insert",
+    "Command": "nvim command",
+    "Terminal": "nvim terminal",
+    "Picker": "nvim picker",
+}
+
+# Scopes that read the keys before the given one, outermost first.
+OUTER = {"tmux": ("desktop",), "tmux prefix": ("desktop",)}
+OUTER["tmux copy mode"] = OUTER["tmux"]
+_NVIM_OUTER = ("desktop", "tmux")
+
+_MOD_ORDER = {"Ctrl": 0, "Alt": 1, "Shift": 2, "Super": 3}
+_MOD_ALIASES = {"Cmd": "Super", "Meta": "Alt", "Control": "Ctrl", "Win": "Super"}
+_KEY_ALIASES = {"escape": "Esc", "return": "Enter", "enter": "Enter", "del": "Delete"}
+
+# Keys offered by free(): one keystroke each, no modifiers but Shift.
+FREE_KEYS = string.ascii_lowercase + string.ascii_uppercase + string.digits
+
+
+@functools.lru_cache(maxsize=None)
+def scopes_for(mode):
+    """The scopes a card mode ("Normal/Visual", "Prefix") binds keys in."""
+    return tuple(SCOPES.get(part.strip(), part.strip()) for part in mode.split("/"))
+
+
+def outer_scopes(scope):
+    if _is_vim(scope):
+        return _NVIM_OUTER
+    return OUTER.get(scope, ())
+
+
+def _chord(mods, key, shifted=False):
+    mods = {_MOD_ALIASES.get(m, m) for m in mods}
+    if len(key) == 1:
+        if shifted and key.isupper():
+            mods.add("Shift")
+        key = key.lower() if key.isalpha() else key
+    else:
+        key = _KEY_ALIASES.get(key.lower()) or ankipush._KEYS.get(key.lower(), key)
+    return (*sorted(mods, key=lambda m: (_MOD_ORDER.get(m, 9), m)), key)
+
+
+@functools.lru_cache(maxsize=ankipush.RENDER_CACHE_SIZE)
+def _vim_chord(token):
+    *mods, key = ankipush._vim_token_to_chord(token)
+    # a bare "H" is Shift+h; inside <…> case only matters with S-
+    return _chord(mods, key, shifted=len(token) == 1)
+
+
+@functools.lru_cache(maxsize=ankipush.RENDER_CACHE_SIZE)
+def _desktop_chord(chord):
+    *mods, key = chord.split("+")
+    return _chord(mods, key or "+")
+
+
+def _is_vim(scope):
+    return scope.startswith("nvim ")
+
+
+def key_sequence(spec, scope):
+    """A key spec as a tuple of canonical chords, e.g. ("Ctrl", "h"), ("g",)."""
+    if _is_vim(scope):
+        return tuple(map(_vim_chord, ankipush._TOKEN.findall(spec)))
+    return tuple(_desktop_chord(chord) for chord in spec.split(" ") if chord)
+
+
+def show(sequence):
+    return " ".join("+".join(chord) for chord in sequence)
+
+
+class _Node:
+    __slots__ = ("children", "bindings", "parent", "chord", "count")
+
+    def __init__(self, parent=None, chord=None):
+        self.children = {}
+        self.bindings = []  # (deck, category, action, key, mode) ending here
+        self.parent = parent
+        self.chord = chord
+        self.count = 0  # bindings at or below this node
+
+    @property
+    def path(self):
+        chords, node = [], self
+        while node.parent is not None:
+            chords.append(node.chord)
+            node = node.parent
+        return tuple(reversed(chords))
+
+
+class ChordIndex:
+    """Chord tries per scope over the cards of any number of decks."""
+
+    def __init__(self):
+        self.roots = {}
+        self.ends = []  # (scope, node) for every node some binding ends at
+        self.size = 0
+
+    def add(self, deck, card):
+        category, action, key, mode = card[:4]
+        for scope in scopes_for(mode):
+            sequence = key_sequence(key, scope)
+            if not sequence:
+                continue
+            node = self.roots.get(scope)
+            if node is None:
+                node = self.roots[scope] = _Node()
+            node.count += 1
+            for chord in sequence:
+                child = node.children.get(chord)
+                if child is None:
+                    child = node.children[chord] = _Node(node, chord)
+                node = child
+                node.count += 1
+            if not node.bindings:
+                self.ends.append((scope, node))
+            node.bindings.append((deck, category, action, key, mode))
+            self.size += 1
+
+    def add_decks(self, plans):
+        for plan in plans:
+            for card in plan.cards:
+                self.add(plan.root_deck, card)
+        return self
+
+    def node(self, scope, sequence):
+        node = self.roots.get(scope)
+        for chord in sequence:
+            if node is None:
+                break
+            node = node.children.get(chord)
+        return node
+
+    def lookup(self, spec):
+        """{scope: bindings} for every scope where exactly `spec` is bound.
+
+        `spec` is read both as vim and as desktop notation, so "<C-h>" and
+        "Ctrl+h" each find the nvim and the tmux/desktop bindings.
+        """
+        readings = {key_sequence(spec, "nvim "), key_sequence(spec, "desktop")}
+        found = {}
+        for scope in self.roots:
+            for sequence in readings:
+                node = self.node(scope, sequence)
+                if node is not None and node.bindings:
+                    found.setdefault(scope, []).extend(node.bindings)
+        return found
+
+    def conflicts(self):
+        """(scope, sequence, bindings) where two or more bindings collide."""
+        for scope, node in self.ends:
+            if len(node.bindings) > 1:
+                yield scope, node.path, node.bindings
+
+    def prefixes(self):
+        """(scope, binding, some longer bindings, how many) for prefix bindings."""
+        for scope, node in self.ends:
+            if node.children:
+                longer = _under(node.children.values(), 4)
+                for binding in node.bindings:
+                    yield scope, binding, longer, node.count - len(node.bindings)
+
+    def shadowed(self):
+        """(scope, binding, outer scope, outer binding) swallowed by outer scopes."""
+        for scope, node in self.ends:
+            for outer in outer_scopes(scope):
+                probe = self.roots.get(outer)
+                for chord in node.path:
+                    probe = probe and probe.children.get(chord)
+                    if probe is None:
+                        break
+                    if probe.bindings:
+                        for binding in node.bindings:
+                            yield scope, binding, outer, probe.bindings[0]
+                        break
+
+    def free(self, scope, spec):
+        """Single keys not yet bound after `spec` in `scope`, as full specs."""
+        node = self.node(scope, key_sequence(spec, scope))
+        taken = node.children if node is not None else {}
+        # vim keys follow on directly; desktop chords are space-separated
+        join = "{}{}" if _is_vim(scope) else "{} {}"
+        return [
+            join.format(spec, key).lstrip()
+            for key, chord in _free_chords(_is_vim(scope))
+            if chord not in taken
+        ]
+
+
+@functools.lru_cache(maxsize=None)
+def _free_chords(vim):
+    """(key, chord) per FREE_KEYS entry; desktop keys ignore case, so once each."""
+    scope = "nvim " if vim else "desktop"
+    chords = {}
+    for key in FREE_KEYS:
+        chords.setdefault(key_sequence(key, scope)[0], key)
+    return [(key, chord) for chord, key in chords.items()]
+
+
+def _under(nodes, limit):
+    """Up to `limit` bindings below the given trie nodes, shortest first."""
+    queue, found = list(nodes), []
+    while queue and len(found) < limit:
+        node = queue.pop(0)
+        found += node.bindings
+        queue += node.children.values()
+    return found[:limit]
+
+
+def _describe(binding):
+    deck, _, action, key, mode = binding
+    return f"{deck} {key!r} [{mode}] {action}"
+
+
+def report(index, out=sys.stdout, limit=None):
+    """Print every finding; returns the number of conflicts (the errors)."""
+    conflicts = list(index.conflicts())
+    for scope, sequence, bindings in conflicts:
+        print(f"conflict  {scope}: {show(sequence)}", file=out)
+        for binding in bindings:
+            print(f"          {_describe(binding)}", file=out)
+    for count, (scope, binding, longer, total) in enumerate(index.prefixes()):
+        if limit is not None and count >= limit:
+            print("prefix    …", file=out)
+            break
+        others = ", ".join(repr(b[3]) for b in longer)
+        more = f" (+{total - len(longer)})" if total > len(longer) else ""
+        print(f"prefix    {scope}: {_describe(binding)}", file=out)
+        print(f"          begins {others}{more}", file=out)
+    for count, (scope, binding, outer, by) in enumerate(index.shadowed()):
+        if limit is not None and count >= limit:
+            print("shadowed  …", file=out)
+            break
+        print(f"shadowed  {scope}: {_describe(binding)}", file=out)
+        print(f"          by {outer}: {_describe(by)}", file=out)
+    return len(conflicts)
+
+
+def check(plans):
+    """Pre-push check over DeckPlans: report, and return False on conflicts."""
+    index = ChordIndex().add_decks(plans)
+    return report(index, limit=20) == 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find keybinding conflicts.")
+    parser.add_argument("--free", metavar="SPEC", help="list free keys after SPEC")
+    parser.add_argument("--lookup", metavar="SPEC", help="show what SPEC is bound to")
+    parser.add_argument(
+        "--scope",
+        default="nvim normal",
+        help="scope or card mode for --free (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    plans = [ankipush.load_deck(path) for path in ankipush.discover_decks()]
+    index = ChordIndex().add_decks(plans)
+    built = time.perf_counter()
+
+    if args.free is not None:
+        scope = SCOPES.get(args.scope, args.scope)
+        node = index.node(scope, key_sequence(args.free, scope))
+        if node is not None and node.bindings:
+            print(f"note: {args.free!r} is itself bound in {scope}:", file=sys.stderr)
+            for binding in node.bindings:
+                print(f"  {_describe(binding)}", file=sys.stderr)
+        print(" ".join(index.free(scope, args.free)))
+        return 0
+    if args.lookup is not None:
+        for scope, bindings in index.lookup(args.lookup).items():
+            for binding in bindings:
+                print(f"{scope}: {_describe(binding)}")
+        return 0
+
+    conflicts = report(index)
+    print(
+        f"{index.size} bindings in {len(index.roots)} scopes from {len(plans)}"
+        f" deck(s), indexed in {(built - started) * 1000:.1f} ms"
+        f" ({len(index.ends)} distinct keys)",
+        file=sys.stderr,
+    )
+    return 1 if conflicts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
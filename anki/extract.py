@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+"""Build deck CARDS from the live config files the decks are about.
+
+A deck's cards.py may name the config files it mirrors in SOURCES, mapping a
+repo-relative path to the category new bindings from that file land in:
+
+    SOURCES = {"tmux/tmux.conf": "Tmux", "nvim/lua/config/keymaps.lua": "Misc"}
+
+The bindings are parsed out of those files (tmux `bind` lines; Lua
+`vim.keymap.set(...)` calls and lazy.nvim `keys = { ... }` specs) and merged
+with the hand-written CARDS, which act as the prompts: a card whose key and
+mode match a binding is kept as written; a binding no card covers becomes a
+new card, titled by its `desc` (or its command); a "config" card whose binding
+is gone is kept but reported as stale. `ankipush.load_deck` and the decks'
+push.py run this automatically, so a push always follows the config.
+
+Parsed bindings are kept in an index under $XDG_CACHE_HOME/ankipush/ keyed by
+each file's mtime and size, with a content hash behind that, so only files
+that actually changed are re-parsed.
+
+    python3 anki/extract.py            # report for every deck with SOURCES
+    python3 anki/extract.py --new nvim # also print new cards as CARDS tuples
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import os
+import re
+import shlex
+import sys
+import threading
+import time
+
+import ankipush
+
+REPO_DIR = os.path.dirname(ankipush.ANKI_DIR)
+
+# Bump when a parser changes what it extracts, to invalidate the index.
+PARSER_VERSION = 1
+
+# One binding as parsed: `key` in the deck's notation (vim notation for Lua,
+# "<prefix> <key>" for tmux), `modes` as card mode names, `line` 1-based.
+Binding = collections.namedtuple("Binding", "key modes desc command line")
+
+
+# ---------------------------------------------------------------------------
+# Key and mode normalization, so hand-written keys match parsed ones
+# ("<c-up>" and "<C-Up>" are the same key).
+# ---------------------------------------------------------------------------
+
+_NAME_CASE = {"cr": "CR", "bs": "BS", "nl": "NL", "nop": "Nop", "leader": "leader"}
+_MOD_CASE = {"c": "C", "a": "A", "m": "A", "s": "S", "d": "D"}
+
+
+def _vim_token(token):
+    if not (token.startswith("<") and token.endswith(">")) or len(token) < 3:
+        return token
+    *mods, name = token[1:-1].split("-")
+    if len(name) > 1:
+        name = _NAME_CASE.get(name.lower(), name[0].upper() + name[1:].lower())
+    mods = [_MOD_CASE.get(m.lower(), m) for m in mods]
+    return "<" + "-".join([*mods, name]) + ">"
+
+
+def normalize_key(spec):
+    """Canonical spelling of a key spec; desktop/tmux notation is kept as is."""
+    if "<" not in spec:
+        return spec.strip()
+    return "".join(map(_vim_token, ankipush._TOKEN.findall(spec)))
+
+
+# Vim map-mode letters -> card mode names, in the order cards list them.
+VIM_MODES = {
+    "n": "Normal",
+    "v": "Visual",
+    "x": "Visual",
+    "s": "Select",
+    "o": "Operator",
+    "i": "Insert",
+    "c": "Command",
+    "t": "Terminal",
+    "": ("Normal", "Visual", "Operator"),
+}
+_MODE_ORDER = ["Normal", "Visual", "Select", "Operator", "Insert", "Command"]
+
+
+def _vim_modes(letters):
+    names = set()
+    for letter in letters:
+        mode = VIM_MODES.get(letter, letter)
+        names.update((mode,) if isinstance(mode, str) else mode)
+    rank = {name: i for i, name in enumerate(_MODE_ORDER)}
+    return tuple(sorted(names, key=lambda name: (rank.get(name, len(rank)), name)))
+
+
+def card_modes(mode):
+    """A card's mode string ("Normal/Visual") as a set of mode names."""
+    return frozenset(part.strip() for part in mode.split("/"))
+
+
+# ---------------------------------------------------------------------------
+# tmux: `bind [-nr] [-T table] [-N note] key command...` lines
+# ---------------------------------------------------------------------------
+
+_TMUX_TABLES = {"prefix": "Prefix", "root": "Root"}
+_TMUX_MODS = {"C": "Ctrl", "M": "Alt", "S": "Shift"}
+
+
+def _tmux_key(key):
+    """tmux key name -> card notation: C-h -> Ctrl+h, H -> Shift+h."""
+    parts = key.split("-")
+    if len(parts) > 1 and parts[-1] and all(p in _TMUX_MODS for p in parts[:-1]):
+        return "+".join([*(_TMUX_MODS[p] for p in parts[:-1]), parts[-1]])
+    if len(key) == 1 and key.isupper():
+        return f"Shift+{key.lower()}"
+    return key
+
+
+def _tmux_command(words):
+    return " ".join(f'"{w}"' if not w or " " in w else w for w in words)
+
+
+def _tmux_lines(text):
+    """(line number, words) per logical line; backslash-newline continues."""
+    pending, start = "", 0
+    for number, line in enumerate(text.splitlines(), 1):
+        if not pending:
+            start = number
+        if line.endswith("\\") and not line.endswith("\\\\"):
+            pending += line[:-1] + " "
+            continue
+        line, pending = pending + line, ""
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        try:
+            yield start, shlex.split(line, comments=True)
+        except ValueError:
+            continue  # unbalanced quotes: not a line tmux would accept either
+
+
+def parse_tmux(text):
+    """Bindings of a tmux.conf: the prefix key plus every `bind`."""
+    prefix, bindings = "C-b", []
+    for line, words in _tmux_lines(text):
+        if not words:
+            continue
+        if words[0] in ("set", "set-option") and "prefix" in words[:-1]:
+            prefix = words[words.index("prefix") + 1]
+            bindings.append(Binding(_tmux_key(prefix), ("Core",), "", "prefix", line))
+            continue
+        if words[0] not in ("bind", "bind-key"):
+            continue
+        table, note, repeat, args = "prefix", "", False, words[1:]
+        while args and args[0].startswith("-") and len(args[0]) > 1:
+            flags, args = args[0][1:], args[1:]
+            for i, flag in enumerate(flags):
+                if flag in "TN":
+                    value = flags[i + 1 :] or (args[0] if args else "")
+                    if not flags[i + 1 :]:
+                        args = args[1:]
+                    if flag == "T":
+                        table = value
+                    else:
+                        note = value
+                    break
+                if flag == "n":
+                    table = "root"
+                elif flag == "r":
+                    repeat = True
+        if len(args) < 2:
+            continue
+        key, command = _tmux_key(args[0]), _tmux_command(args[1:])
+        if repeat:
+            command += " (repeatable)"
+        mode = _TMUX_TABLES.get(table, table)
+        if table.startswith("copy-mode"):
+            mode = "Copy mode"
+        if table == "prefix":
+            key = f"{_tmux_key(prefix)} {key}"
+        bindings.append(Binding(key, (mode,), note, command, line))
+    return bindings
+
+
+# ---------------------------------------------------------------------------
+# Lua: a tokenizer plus just enough structure to read call arguments and
+# table constructors, for vim.keymap.set(...) and lazy.nvim keys = { ... }.
+# ---------------------------------------------------------------------------
+
+_LUA_TOKEN = re.compile(
+    r"""
+      (?P<comment>--\[(?P<ceq>=*)\[.*?\](?P=ceq)\]|--[^\n]*)
+    | (?P<string>\[(?P<seq>=*)\[.*?\](?P=seq)\]
+                |"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    | (?P<name>[A-Za-z_]\w*)
+    | (?P<number>\d[\w.]*)
+    | (?P<op>\.\.\.|\.\.|==|~=|<=|>=|::|\S)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_OPEN = {"(", "{", "[", "function", "if", "do", "repeat"}
+_CLOSE = {")", "}", "]", "end", "until"}
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "\\": "\\", '"': '"', "'": "'"}
+
+
+def _lua_tokens(text):
+    tokens = []
+    for m in _LUA_TOKEN.finditer(text):
+        kind = m.lastgroup  # the outer group, even for long brackets
+        if kind != "comment":
+            tokens.append((kind, m.group(kind), m.start()))
+    return tokens
+
+
+def _lua_string(token):
+    kind, text, _ = token
+    if kind != "string":
+        return None
+    if text.startswith("["):
+        body = text[text.index("[", 1) + 1 : text.rindex("]", 0, -1)]
+        return body[1:] if body.startswith("\n") else body
+    return re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), m.group(1)), text[1:-1])
+
+
+def _lua_items(tokens, i):
+    """Split the bracketed list opening at tokens[i] into top-level items.
+
+    Returns ([(start, end), ...], index past the closing bracket); each item is
+    a token slice, for call arguments and table fields alike.
+    """
+    items, depth, start = [], 0, i + 1
+    for j in range(i, len(tokens)):
+        text = tokens[j][1] if tokens[j][0] in ("op", "name") else None
+        if text in _OPEN:
+            depth += 1
+        elif text in _CLOSE:
+            depth -= 1
+            if depth == 0:
+                if start < j:
+                    items.append((start, j))
+                return items, j + 1
+        elif depth == 1 and text in (",", ";"):
+            items.append((start, j))
+            start = j + 1
+    return items, len(tokens)
+
+
+def _lua_table(tokens, start, end):
+    """A table constructor slice -> (positional slices, {field: slice})."""
+    if tokens[start][1] != "{":
+        return None
+    positional, named = [], {}
+    for a, b in _lua_items(tokens, start)[0]:
+        if b - a > 2 and tokens[a][0] == "name" and tokens[a + 1][1] == "=":
+            named[tokens[a][1]] = (a + 2, b)
+        elif tokens[a][1] != "[":  # [expr] = value fields are not specs
+            positional.append((a, b))
+    return positional, named
+
+
+def _lua_value(tokens, item):
+    """A slice holding one string literal -> that string, else None."""
+    start, end = item
+    return _lua_string(tokens[start]) if end - start == 1 else None
+
+
+def _lua_modes(tokens, item):
+    if item is None:
+        return ("n",)
+    value = _lua_value(tokens, item)
+    if value is not None:
+        return (value,)
+    table = _lua_table(tokens, *item)
+    if table is None:
+        return ("n",)
+    return tuple(v for v in (_lua_value(tokens, p) for p in table[0]) if v is not None)
+
+
+def _rhs_command(rhs):
+    """Notes for a string rhs: "<cmd>Lspsaga rename<CR>" -> "Lspsaga rename"."""
+    return re.sub(r"(?i)^(<cmd>|:)|<cr>$", "", rhs).strip()
+
+
+def parse_lua(text):
+    """Bindings from vim.keymap.set(...) calls and lazy.nvim `keys` specs.
+
+    Buffer-local and <Nop> mappings are skipped. Modes mapping the same key to
+    the same rhs are merged into one binding ("Normal/Visual").
+    """
+    tokens = _lua_tokens(text)
+    newlines = [m.start() for m in re.finditer("\n", text)]
+
+    def line_of(offset):
+        lo, hi = 0, len(newlines)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if newlines[mid] < offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo + 1
+
+    raw = []  # (key, mode letters, rhs source, desc, command, offset)
+
+    def add(lhs, modes, rhs, opts, offset):
+        if lhs is None or not rhs:
+            return
+        start, end = rhs
+        source = text[tokens[start][2] : tokens[end - 1][2] + len(tokens[end - 1][1])]
+        value = _lua_value(tokens, rhs)
+        if value is not None and value.lower() == "<nop>":
+            return
+        if "buffer" in opts:
+            return
+        desc = _lua_value(tokens, opts["desc"]) if "desc" in opts else None
+        command = _rhs_command(value) if value is not None else ""
+        raw.append((normalize_key(lhs), modes, source, desc or "", command, offset))
+
+    keymap_set = [".", "keymap", ".", "set", "("]
+    i = 0
+    while i < len(tokens):
+        kind, text_i, offset = tokens[i]
+        if (
+            kind == "name"
+            and text_i == "vim"
+            and [t[1] for t in tokens[i + 1 : i + 6]] == keymap_set
+        ):
+            args, _ = _lua_items(tokens, i + 5)
+            i += 6  # keep scanning inside: nested maps are found on their own
+            if len(args) < 3:
+                continue
+            opts = {}
+            if len(args) > 3:
+                table = _lua_table(tokens, *args[3])
+                opts = table[1] if table else {}
+            lhs = _lua_value(tokens, args[1])
+            add(lhs, _lua_modes(tokens, args[0]), args[2], opts, offset)
+            continue
+        if (
+            kind == "name"
+            and text_i == "keys"
+            and i > 0
+            and tokens[i - 1][1] in ("{", ",", ";")
+            and [t[1] for t in tokens[i + 1 : i + 3]] == ["=", "{"]
+        ):
+            for a, b in _lua_items(tokens, i + 2)[0]:
+                spec = _lua_table(tokens, a, b)
+                if spec is None or not spec[0]:
+                    continue
+                positional, named = spec
+                lhs = _lua_value(tokens, positional[0])
+                rhs = positional[1] if len(positional) > 1 else None
+                modes = _lua_modes(tokens, named.get("mode"))
+                add(lhs, modes, rhs, named, tokens[a][2])
+            i += 3
+            continue
+        i += 1
+
+    merged = {}
+    for key, modes, source, desc, command, offset in raw:
+        entry = merged.setdefault((key, source, desc), [set(), command, offset])
+        entry[0].update(modes)
+    return [
+        Binding(key, _vim_modes(letters), desc, command, line_of(offset))
+        for (key, _, desc), (letters, command, offset) in merged.items()
+    ]
+
+
+def parser_for(path):
+    return parse_lua if path.endswith(".lua") else parse_tmux
+
+
+# ---------------------------------------------------------------------------
+# Index: parsed bindings per file, reused while the file is unchanged.
+# ---------------------------------------------------------------------------
+
+
+def index_path():
+    return os.path.join(os.path.dirname(ankipush.MANIFEST_PATH), "extract.json")
+
+
+class ExtractIndex:
+    """Bindings per config file, keyed by [mtime_ns, size] and a sha256."""
+
+    def __init__(self, path=None):
+        self.path = path or index_path()
+        self.files = {}
+        self.dirty = False
+        self.stats = collections.Counter()  # reused / rehashed / parsed
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                data = json.load(fh)
+            if data.get("version") == PARSER_VERSION:
+                self.files = data["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def bindings(self, relpath):
+        """Bindings of a repo-relative config file; [] if it does not exist."""
+        path = os.path.join(REPO_DIR, relpath)
+        try:
+            st = os.stat(path)
+        except OSError:
+            if self.files.pop(relpath, None) is not None:
+                self.dirty = True
+            return []
+        stamp = [st.st_mtime_ns, st.st_size]
+        entry = self.files.get(relpath)
+        if entry and entry["stamp"] == stamp:
+            self.stats["reused"] += 1
+        else:
+            with open(path, "rb") as fh:
+                blob = fh.read()
+            digest = hashlib.sha256(blob).hexdigest()
+            if entry and entry["sha256"] == digest:
+                self.stats["rehashed"] += 1  # touched, not edited
+            else:
+                self.stats["parsed"] += 1
+                text = blob.decode("utf-8", errors="replace")
+                entry = {"sha256": digest, "bindings": parser_for(relpath)(text)}
+            entry["stamp"] = stamp
+            self.files[relpath] = entry
+            self.dirty = True
+        return [
+            Binding(key, tuple(modes), desc, command, line)
+            for key, modes, desc, command, line in entry["bindings"]
+        ]
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"version": PARSER_VERSION, "files": self.files}, fh)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+_index = None
+_index_lock = threading.Lock()  # load_deck runs decks on a thread pool
+
+
+# ---------------------------------------------------------------------------
+# Merging parsed bindings with a deck's hand-written cards
+# ---------------------------------------------------------------------------
+
+
+Merge = collections.namedtuple("Merge", "cards matched new stale")
+
+
+def merge_cards(cards, extracted):
+    """Hand-written `cards` plus a card per uncovered (category, Binding).
+
+    Returns a Merge: the cards, then the matched bindings, the new cards, and
+    the "config" cards no parsed binding backs.
+    """
+    by_key = {}
+    for category, binding in extracted:
+        entry = (normalize_key(binding.key), frozenset(binding.modes))
+        by_key.setdefault(entry, (category, binding))
+    covered, stale = set(), []
+    for card in cards:
+        entry = (normalize_key(card[2]), card_modes(card[3]))
+        if entry in by_key:
+            covered.add(entry)
+        elif card[5:6] == ("config",):
+            stale.append(card)
+
+    taken = {(card[0], card[1]) for card in cards}
+    new = []
+    for entry, (category, binding) in by_key.items():
+        if entry in covered:
+            continue
+        action = binding.desc or binding.command or binding.key
+        if (category, action) in taken:  # the identity must stay unique
+            action = f"{action} ({binding.key})"
+        taken.add((category, action))
+        notes = binding.command if binding.desc else ""
+        mode = "/".join(binding.modes)
+        new.append((category, action, binding.key, mode, notes, "config"))
+    return Merge([*cards, *new], len(covered), new, stale)
+
+
+def extract_deck(module):
+    """Merge for a deck module with SOURCES (see the module docstring)."""
+    global _index
+    with _index_lock:
+        if _index is None or _index.path != index_path():
+            _index = ExtractIndex()
+        extracted = [
+            (category, binding)
+            for relpath, category in module.SOURCES.items()
+            for binding in _index.bindings(relpath)
+        ]
+        _index.save()
+    return merge_cards(module.CARDS, extracted)
+
+
+def deck_cards(module):
+    """CARDS for a deck module, merged with its SOURCES when it has any."""
+    if not getattr(module, "SOURCES", None):
+        return module.CARDS
+    return extract_deck(module).cards
+
+
+# ---------------------------------------------------------------------------
+# CLI: report what the config files add to, or no longer back in, each deck.
+# ---------------------------------------------------------------------------
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract deck cards from configs.")
+    parser.add_argument("decks", nargs="*", help="deck folders (default: all)")
+    parser.add_argument(
+        "--new", action="store_true", help="print new cards as CARDS tuples"
+    )
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    for path in ankipush.discover_decks():
+        name = os.path.basename(os.path.dirname(path))
+        module = ankipush.import_cards(path)
+        if args.decks and name not in args.decks:
+            continue
+        if not getattr(module, "SOURCES", None):
+            continue
+        merge = extract_deck(module)
+        print(
+            f"{name}: {len(merge.cards)} cards, {merge.matched} bindings with"
+            f" hand-written prompts, {len(merge.new)} new, {len(merge.stale)} stale"
+        )
+        for card in merge.new:
+            print(f"  + {card[2]:<20} {card[3]:<14} {card[1]}")
+            if args.new:
+                print(f"    {card!r},")
+        for card in merge.stale:
+            print(f"  ? {card[2]:<20} {card[3]:<14} {card[1]} (not in SOURCES)")
+    stats = _index.stats if _index else {}
+    print(
+        f"Extracted in {(time.perf_counter() - started) * 1000:.1f} ms"
+        f" ({stats.get('parsed', 0)} parsed, {stats.get('rehashed', 0)} rehashed,"
+        f" {stats.get('reused', 0)} unchanged)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""In-process stand-in for the AnkiConnect add-on, for benchmarks and dry runs.
+
+Implements the slice of the AnkiConnect v6 API that ankipush uses, against an
+in-memory collection (decks, note types, notes, cards), served over a local
+keep-alive HTTP server. Every request can be delayed by a fixed latency to
+model Anki's GUI thread, and the server counts round trips, bytes in/out and
+actions so callers can measure what a push costs without a running Anki.
+With `close_after=True` it drops the connection after every response without
+a `Connection: close` header, as the real add-on's web server does.
+
+    server = FakeAnkiConnect(latency=0.002).start()
+    ankipush._transport = ankipush.Transport(url=server.url)
+    ...
+    server.stats()  # {"requests": ..., "bytes_in": ..., "actions": {...}}
+    server.stop()
+
+Run directly to serve on a fixed port:  python3 anki/fakeconnect.py --port 8765
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------------------------------------------------------------------------
+# Search: the subset of Anki's query language ankipush sends — space-separated
+# terms (optionally "quoted" and/or -negated) that must all match:
+#   note:<model>  deck:<name>  <Field>:<value>   with * and _ wildcards
+# ---------------------------------------------------------------------------
+
+_TERM = re.compile(r'(-?)(?:"((?:[^"\\]|\\.)*)"|(\S+))')
+
+
+def _glob_regex(pattern):
+    """Anki wildcard pattern -> compiled, case-insensitive full-match regex."""
+    out, escaped = [], False
+    for ch in pattern:
+        if escaped:
+            out.append(re.escape(ch))
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == "*":
+            out.append(".*")
+        elif ch == "_":
+            out.append(".")
+        else:
+            out.append(re.escape(ch))
+    return re.compile("".join(out), re.IGNORECASE | re.DOTALL)
+
+
+def parse_query(query):
+    """Split a query into (negated, key, compiled value) terms."""
+    terms = []
+    for neg, quoted, bare in _TERM.findall(query):
+        term = quoted if quoted else bare
+        key, sep, value = term.partition(":")
+        if not sep:
+            raise ValueError(f"unsupported search term: {term!r}")
+        terms.append((bool(neg), key.lower(), _glob_regex(value), value))
+    return terms
+
+
+class Collection:
+    """The in-memory collection the fake server reads and writes."""
+
+    def __init__(self):
+        self.decks = {"Default"}
+        self.models = {}
+        self.notes = {}  # id -> {"model", "fields", "tags", "cards", "guid"}
+        self.cards = {}  # id -> {"note", "deck"} + scheduling fields once reviewed
+        self.revlog = []  # (id, card, ease, ivl, lastIvl, factor, time, type)
+        self._ids = itertools.count(1_700_000_000_000)
+        self._last_review = 0
+
+    def _note_matches(self, nid, terms, deck=None):
+        note = self.notes[nid]
+        for negated, key, regex, raw in terms:
+            if key == "note":
+                hit = bool(regex.fullmatch(note["model"]))
+            elif key == "nid":
+                hit = str(nid) in raw.split(",")
+            elif key == "is" and raw == "new":
+                hit = not any(self.cards[c].get("reps") for c in note["cards"])
+            elif key == "deck":
+                if deck is None:
+                    decks = [self.cards[c]["deck"] for c in note["cards"]]
+                else:
+                    decks = [deck]
+                hit = any(
+                    regex.fullmatch(d) or (raw != "*" and _is_child(d, regex))
+                    for d in decks
+                )
+            else:
+                fields = {k.lower(): v for k, v in note["fields"].items()}
+                hit = key in fields and bool(regex.fullmatch(fields[key]))
+            if hit == negated:
+                return False
+        return True
+
+    def find_notes(self, query):
+        terms = parse_query(query)
+        return [nid for nid in self.notes if self._note_matches(nid, terms)]
+
+    def find_cards(self, query):
+        terms = parse_query(query)
+        return [
+            cid
+            for cid, card in self.cards.items()
+            if self._note_matches(card["note"], terms, deck=card["deck"])
+        ]
+
+    def add_note(self, note):
+        model = self.models.get(note["modelName"])
+        if model is None:
+            raise ValueError(f"model was not found: {note['modelName']}")
+        nid, cid = next(self._ids), next(self._ids)
+        deck = note.get("deckName", "Default")
+        self.decks.add(deck)
+        self.notes[nid] = {
+            "model": note["modelName"],
+            "fields": {name: note["fields"].get(name, "") for name in model},
+            "tags": list(dict.fromkeys(note.get("tags", []))),
+            "cards": [cid],
+            "guid": note.get("guid") or f"fake{nid}",
+        }
+        self.cards[cid] = {"note": nid, "deck": deck}
+        return nid
+
+    def review(self, cid, ease, duration=3000):
+        """Answer card `cid` with `ease` (1 again .. 4 easy), roughly like SM-2."""
+        card = self.cards[cid]
+        last, factor = card.get("interval", 0), card.get("factor", 2500)
+        if ease == 1:
+            interval, factor = 0, max(1300, factor - 200)
+            card["lapses"] = card.get("lapses", 0) + (last > 0)
+            kind = 2 if last > 0 else 0  # relearn / learn
+        else:
+            factor = max(1300, factor + (ease - 3) * 150)
+            interval = max(1, round(max(last, 1) * factor / 1000 * (ease - 1) / 2))
+            kind = 1 if last > 0 else 0
+        card.update(interval=interval, factor=factor, reps=card.get("reps", 0) + 1)
+        rid = max(self._last_review + 1, int(time.time() * 1000))
+        self._last_review = rid
+        self.revlog.append((rid, cid, ease, interval, last, factor, duration, kind))
+        return rid
+
+    def deck_reviews(self, deck, start=0):
+        """Reviews (newer than `start`) of cards now in exactly `deck`."""
+        return [
+            r
+            for r in self.revlog
+            if r[0] > start and r[1] in self.cards and self.cards[r[1]]["deck"] == deck
+        ]
+
+
+def _is_child(deck, regex):
+    """deck:X also matches every X::child deck."""
+    parts = deck.split("::")
+    return any(regex.fullmatch("::".join(parts[:i])) for i in range(1, len(parts)))
+
+
+# ---------------------------------------------------------------------------
+# Actions
+# ---------------------------------------------------------------------------
+
+
+def _can_add(col, note):
+    model = col.models.get(note["modelName"])
+    if model is None:
+        return False
+    first = note["fields"].get(model[0], "")
+    if not first.strip():
+        return False
+    if note.get("options", {}).get("allowDuplicate"):
+        return True
+    return not any(
+        n["model"] == note["modelName"] and n["fields"][model[0]] == first
+        for n in col.notes.values()
+    )
+
+
+def _note_info(col, nid):
+    note = col.notes[nid]
+    return {
+        "noteId": nid,
+        "modelName": note["model"],
+        "tags": list(note["tags"]),
+        "fields": {
+            name: {"value": value, "order": order}
+            for order, (name, value) in enumerate(note["fields"].items())
+        },
+        "cards": list(note["cards"]),
+    }
+
+
+def _delete_notes(col, ids):
+    for nid in ids:
+        for cid in col.notes.pop(nid)["cards"]:
+            del col.cards[cid]
+
+
+def _set_tags(col, ids, tags, add):
+    wanted = tags.split()
+    for nid in ids:
+        note = col.notes[nid]
+        if add:
+            note["tags"] = list(dict.fromkeys(note["tags"] + wanted))
+        else:
+            drop = {t.lower() for t in wanted}
+            note["tags"] = [t for t in note["tags"] if t.lower() not in drop]
+
+
+def _delete_decks(col, decks, cards_too):
+    for deck in decks:
+        doomed = [c for c, card in col.cards.items() if card["deck"] == deck]
+        if doomed and not cards_too:
+            raise ValueError("cardsToo must be true")
+        _delete_notes(col, {col.cards[c]["note"] for c in doomed})
+        col.decks.discard(deck)
+
+
+def _change_deck(col, cards, deck):
+    col.decks.add(deck)
+    for cid in cards:
+        col.cards[cid]["deck"] = deck
+
+
+def _create_model(col, modelName, inOrderFields, **_):
+    if modelName in col.models:
+        raise ValueError("Model name already exists")
+    col.models[modelName] = list(inOrderFields)
+    return {"name": modelName}
+
+
+def _update_note_fields(col, note):
+    col.notes[note["id"]]["fields"].update(note["fields"])
+
+
+def _card_info(col, cid):
+    card = col.cards.get(cid)
+    if card is None:
+        return {}  # AnkiConnect answers unknown ids with an empty object
+    note = col.notes[card["note"]]
+    return {
+        "cardId": cid,
+        "note": card["note"],
+        "deckName": card["deck"],
+        "modelName": note["model"],
+        "fields": {
+            name: {"value": value, "order": order}
+            for order, (name, value) in enumerate(note["fields"].items())
+        },
+        "interval": card.get("interval", 0),
+        "factor": card.get("factor", 0),
+        "reps": card.get("reps", 0),
+        "lapses": card.get("lapses", 0),
+        "type": 2 if card.get("interval") else 0,
+        "queue": 2 if card.get("interval") else 0,
+        "due": 0,
+        "mod": 0,
+    }
+
+
+def _fake_id(kind, name):
+    digest = hashlib.sha256(f"{kind}\x1f{name}".encode()).digest()
+    return 1_000_000_000_000 + int.from_bytes(digest[:6], "big")
+
+
+def _import_package(col, path):
+    """Merge an .apkg like Anki's importer: notes match on GUID."""
+    with tempfile.TemporaryDirectory() as tmp:
+        with zipfile.ZipFile(path) as package:
+            package.extract("collection.anki2", tmp)
+        db = sqlite3.connect(os.path.join(tmp, "collection.anki2"))
+        models_json, decks_json = db.execute("SELECT models, decks FROM col").fetchone()
+        models = {int(k): v for k, v in json.loads(models_json).items()}
+        decks = {int(k): v["name"] for k, v in json.loads(decks_json).items()}
+        deck_of = dict(db.execute("SELECT nid, did FROM cards"))
+        rows = db.execute("SELECT id, guid, mid, tags, flds FROM notes").fetchall()
+        db.close()
+
+    for model in models.values():
+        col.models.setdefault(model["name"], [f["name"] for f in model["flds"]])
+    by_guid = {note["guid"]: nid for nid, note in col.notes.items()}
+    for nid, guid, mid, tags, flds in rows:
+        model = models[mid]
+        names = [f["name"] for f in sorted(model["flds"], key=lambda f: f["ord"])]
+        fields = dict(zip(names, flds.split("\x1f")))
+        deck = decks[deck_of[nid]]
+        col.decks.add(deck)
+        if guid in by_guid:
+            note = col.notes[by_guid[guid]]
+            note["fields"].update(fields)
+            note["tags"] = tags.split()
+            continue
+        col.add_note(
+            {
+                "modelName": model["name"],
+                "deckName": deck,
+                "fields": fields,
+                "tags": tags.split(),
+                "guid": guid,
+            }
+        )
+    return True
+
+
+ACTIONS = {
+    "version": lambda col: 6,
+    "deckNames": lambda col: sorted(col.decks),
+    "createDeck": lambda col, deck: col.decks.add(deck),
+    "deleteDecks": lambda col, decks, cardsToo=False: _delete_decks(
+        col, decks, cardsToo
+    ),
+    "changeDeck": _change_deck,
+    "modelNames": lambda col: sorted(col.models),
+    "modelNamesAndIds": lambda col: {m: _fake_id("model", m) for m in col.models},
+    "deckNamesAndIds": lambda col: {d: _fake_id("deck", d) for d in col.decks},
+    "importPackage": _import_package,
+    "createModel": _create_model,
+    "updateModelStyling": lambda col, model: None,
+    "updateModelTemplates": lambda col, model: None,
+    "canAddNotes": lambda col, notes: [_can_add(col, n) for n in notes],
+    "addNotes": lambda col, notes: [
+        col.add_note(n) if _can_add(col, n) else None for n in notes
+    ],
+    "findNotes": lambda col, query: col.find_notes(query),
+    "findCards": lambda col, query: col.find_cards(query),
+    "notesInfo": lambda col, notes: [_note_info(col, n) for n in notes],
+    "cardsInfo": lambda col, cards: [_card_info(col, c) for c in cards],
+    "getLatestReviewID": lambda col, deck: max(
+        (r[0] for r in col.deck_reviews(deck)), default=0
+    ),
+    "cardReviews": lambda col, deck, startID: [
+        [rid, cid, -1, *rest] for rid, cid, *rest in col.deck_reviews(deck, startID)
+    ],
+    "updateNoteFields": _update_note_fields,
+    "addTags": lambda col, notes, tags: _set_tags(col, notes, tags, add=True),
+    "removeTags": lambda col, notes, tags: _set_tags(col, notes, tags, add=False),
+    "deleteNotes": lambda col, notes: _delete_notes(col, notes),
+}
+
+
+def run_action(col, action, params):
+    if action == "multi":
+        results = []
+        for item in params["actions"]:
+            try:
+                result = run_action(col, item["action"], item.get("params", {}))
+                results.append({"result": result, "error": None})
+            except Exception as exc:  # per-action errors, like AnkiConnect
+                results.append({"result": None, "error": str(exc)})
+        return results
+    handler = ACTIONS.get(action)
+    if handler is None:
+        raise ValueError("unsupported action")
+    return handler(col, **params)
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like a pooled client expects
+    # Headers and body go out in separate writes; without TCP_NODELAY, Nagle +
+    # delayed ACK would add ~40ms to every response and swamp the measurements.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server.fake
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if server.latency:
+            time.sleep(server.latency)
+        request = json.loads(body)
+        with server.lock:
+            server.count(request, len(body))
+            try:
+                result = run_action(
+                    server.collection, request["action"], request.get("params", {})
+                )
+                reply = {"result": result, "error": None}
+            except Exception as exc:
+                reply = {"result": None, "error": str(exc)}
+        data = json.dumps(reply).encode()
+        with server.lock:
+            server.bytes_out += len(data)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        if server.close_after:
+            self.close_connection = True  # silently, no "Connection: close"
+
+
+class FakeAnkiConnect:
+    """A fake AnkiConnect server with an in-memory collection and counters."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, close_after=False):
+        self.latency = latency
+        self.close_after = close_after
+        self.collection = Collection()
+        self.lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+        self.reset_stats()
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, request, size):
+        self.requests += 1
+        self.bytes_in += size
+        self.actions[request["action"]] += 1
+        if request["action"] == "multi":
+            for item in request["params"]["actions"]:
+                self.actions[item["action"]] += 1
+
+    def reset_stats(self):
+        self.requests = self.bytes_in = self.bytes_out = 0
+        self.actions = Counter()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "actions": dict(self.actions),
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake AnkiConnect API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--latency-ms", type=float, default=0.0, help="delay added to every request"
+    )
+    parser.add_argument(
+        "--close-after",
+        action="store_true",
+        help="close the connection after every response, like AnkiConnect",
+    )
+    args = parser.parse_args(argv)
+    server = FakeAnkiConnect(
+        port=args.port, latency=args.latency_ms / 1000, close_after=args.close_after
+    )
+    print(f"Fake AnkiConnect on {server.url} (Ctrl+C to stop)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
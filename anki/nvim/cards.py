@@ -6,11 +6,30 @@ category. The `action` is the prompt (front); the `key` is the answer (back),
 so you train productive recall: "I want to do X — which keys?".
 
 Sources:
-- Cards tagged source "config" come from this repo's nvim/ Lua config.
+- Cards tagged source "config" come from this repo's nvim/ Lua config. The
+  files in SOURCES are parsed on every push (../extract.py): bindings with no
+  card below are added with their `desc` as the prompt.
 - Cards tagged source "lazyvim" are LazyVim defaults you rely on but that are
   not written in your config files (kept here so the deck is complete).
 """
 
+ROOT_DECK = "nvim"
+MODEL = "nvim-keybind"
+# Flat layout: one "nvim" deck. Category survives as a tag and on-card badge.
+SUBDECKS = False
+
+# Config files whose bindings extract.py merges into CARDS (see ../extract.py):
+# a binding with no card below becomes a card in the mapped category.
+SOURCES = {
+    "nvim/lua/plugins/lspsaga.lua": "LSP / Code",
+    "nvim/lua/config/keymaps.lua": "Editing / Misc",
+    "nvim/lua/plugins/telescope.lua": "Search / Find",
+    "nvim/lua/plugins/smart-splits.lua": "Splits / Windows",
+    "nvim/lua/plugins/yazi.lua": "Files / Explorer",
+    "nvim/lua/plugins/git.lua": "Git",
+    "nvim/lua/plugins/markdown-preview.lua": "Editing / Misc",
+}
+
 # fmt: off
 CARDS = [
     # ---- LSP / Code (nvim/lua/plugins/lspsaga.lua) ----
@@ -10,9 +10,17 @@ import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from ankipush import push_cards  # noqa: E402
-from cards import CARDS  # noqa: E402
+import cards  # noqa: E402
+from ankipush import push_cards, push_parser  # noqa: E402
+from extract import deck_cards  # noqa: E402
 
 if __name__ == "__main__":
-    # Flat layout: one "nvim" deck. Category survives as a tag and on-card badge.
-    push_cards(root_deck="nvim", model="nvim-keybind", cards=CARDS, subdecks=False)
+    args = push_parser(__doc__.splitlines()[0]).parse_args()
+    push_cards(
+        root_deck=cards.ROOT_DECK,
+        model=cards.MODEL,
+        cards=deck_cards(cards),  # CARDS + bindings parsed from cards.SOURCES
+        subdecks=cards.SUBDECKS,
+        force=args.force,
+        chunk_size=args.chunk_size,
+    )
@@ -11,6 +11,10 @@ Super/Cmd bindings) or remapped. Those teach what changed vs. stock Pop!_OS.
 `mode` is reused as a scope badge: "COSMIC" (default) or "Custom" (override).
 """
 
+ROOT_DECK = "popos"
+MODEL = "cosmic-keybind"
+SUBDECKS = True
+
 # fmt: off
 CARDS = [
     # ---- Tiling & Layout ----
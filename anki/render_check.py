@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Check that the memoized key renderer matches the original one byte for byte.
+
+`reference_render_key` is render_key as it was before the precompiled
+tokenizer and LRU caches. Every key in the deck folders, the bench.py synthetic
+decks and a batch of random specs are rendered with both (one at a time and in
+bulk through render_keys), and any difference is printed; the exit status is 1
+if there was one.
+
+    python3 anki/render_check.py              # 100k random specs
+    python3 anki/render_check.py --fuzz 1000000 --seed 7
+"""
+
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ankipush  # noqa: E402
+import bench  # noqa: E402
+
+# ---------------------------------------------------------------------------
+# The renderer before memoization, verbatim.
+# ---------------------------------------------------------------------------
+
+
+def _reference_vim_token_to_chord(token):
+    if token == "<leader>":
+        return ["Space"]
+    if token.startswith("<") and token.endswith(">"):
+        *mods, key = token[1:-1].split("-")
+        labels = [ankipush._MODS.get(m.upper(), m) for m in mods]
+        labels.append(ankipush._KEYS.get(key.lower(), key))
+        return labels
+    return [token]
+
+
+def reference_render_key(spec):
+    if "<" in spec:  # vim notation
+        chords = [
+            _reference_vim_token_to_chord(t) for t in re.findall(r"<[^>]+>|.", spec)
+        ]
+    else:  # desktop notation
+        chords = [
+            [ankipush._KEYS.get(t.lower(), t) for t in chord.split("+")]
+            for chord in spec.split(" ")
+        ]
+    return " ".join("+".join(f"<kbd>{c}</kbd>" for c in chord) for chord in chords)
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+_ALPHABET = string.ascii_letters + string.digits + "<>-+ []`\\/"
+_HEADS = ("<leader>", "<C-", "<A-S-", "<c-", "Super+", "Ctrl+Alt+", "<", "")
+_TAILS = ("x", "cr>", "CR>", "Left", "tab>", "<bs>", " Up", "space>", "-", "+", "")
+
+
+def deck_specs():
+    specs = []
+    for path in ankipush.discover_decks():
+        specs += [card[2] for card in ankipush.import_cards(path).CARDS]
+    return specs
+
+
+def random_specs(count, seed):
+    rnd = random.Random(seed)
+    specs = []
+    for i in range(count):
+        if i % 2:
+            length = rnd.randint(0, 12)
+            specs.append("".join(rnd.choice(_ALPHABET) for _ in range(length)))
+        else:
+            specs.append(rnd.choice(_HEADS) + rnd.choice(_TAILS) + rnd.choice(_TAILS))
+    return specs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare key renderers.")
+    parser.add_argument("--fuzz", type=int, default=100_000, help="random specs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    specs = deck_specs()
+    specs += [card[2] for card in bench.synthetic_cards(10_000)]
+    specs += random_specs(args.fuzz, args.seed)
+
+    started = time.perf_counter()
+    expected = [reference_render_key(spec) for spec in specs]
+    reference = time.perf_counter() - started
+    started = time.perf_counter()
+    bulk = ankipush.render_keys(specs)
+    rendered = time.perf_counter() - started
+
+    mismatches = [
+        (spec, want, got)
+        for spec, want, got in zip(specs, expected, bulk)
+        if got != want or ankipush.render_key(spec) != want
+    ]
+    for spec, want, got in mismatches[:20]:
+        print(f"{spec!r}\n  want {want!r}\n  got  {got!r}")
+    print(
+        f"{len(specs)} specs, {len(mismatches)} mismatch(es);"
+        f" reference {reference * 1000:.0f} ms, render_keys {rendered * 1000:.0f} ms"
+    )
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
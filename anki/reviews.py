@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Mirror review history for the keybinding decks into a local SQLite store.
+
+A push only ever writes to Anki; this reads back what Anki learned. `pull`
+copies the review log and current card stats of every deck folder's root deck
+(and its subdecks) into $XDG_CACHE_HOME/ankipush/reviews.sqlite3, and the
+queries below answer "which keys do I keep forgetting" from that copy:
+
+    python3 anki/reviews.py pull                        # fetch what is new
+    python3 anki/reviews.py weakest                     # worst 3 per category
+    python3 anki/reviews.py weakest --deck nvim -n 5 --since 30
+    python3 anki/reviews.py categories                  # fail rate per category
+
+A pull is incremental: one multi request asks each deck for its latest review
+id, and only decks with reviews newer than the stored one are fetched, from
+that id on. cardsInfo is requested only for cards that were reviewed since, or
+that are not stored yet, in chunks; an untouched collection costs three
+requests and no full-collection scan. `--full` refetches everything.
+"""
+
+import argparse
+import html
+import os
+import re
+import sqlite3
+import time
+
+import ankipush
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    id integer primary key, note integer not null,
+    root_deck text not null, deck text not null, category text not null,
+    action text not null, key text not null, mode text not null,
+    interval integer not null, factor integer not null, reps integer not null,
+    lapses integer not null, due integer not null, queue integer not null,
+    type integer not null, synced integer not null
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    id integer primary key, card integer not null, ease integer not null,
+    interval integer not null, last_interval integer not null,
+    factor integer not null, duration integer not null, type integer not null
+);
+CREATE TABLE IF NOT EXISTS state (
+    deck text primary key, last_review integer not null
+);
+CREATE INDEX IF NOT EXISTS ix_reviews_card ON reviews (card, id, ease, type);
+CREATE INDEX IF NOT EXISTS ix_cards_category ON cards (root_deck, category);
+"""
+
+# revlog types: 0 learn, 1 review, 2 relearn, 3 filtered/cram, 4 manual.
+# Only the first three are real recall attempts.
+RECALL_TYPES = 3
+
+
+def db_path():
+    return os.path.join(os.path.dirname(ankipush.MANIFEST_PATH), "reviews.sqlite3")
+
+
+def connect(path=None):
+    path = path or db_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    db.executescript(SCHEMA)
+    return db
+
+
+def root_decks():
+    """The root deck of every deck folder, without loading or rendering cards."""
+    roots = []
+    for path in ankipush.discover_decks():
+        name = os.path.basename(os.path.dirname(path))
+        roots.append(getattr(ankipush.import_cards(path), "ROOT_DECK", name))
+    return roots
+
+
+def _root_of(deck, roots):
+    for root in roots:
+        if deck == root or deck.startswith(root + "::"):
+            return root
+    return None
+
+
+def _plain(field):
+    """A rendered Key field back as text: "<kbd>Ctrl</kbd>+<kbd>h</kbd>" -> "Ctrl+h"."""
+    return html.unescape(re.sub(r"<[^>]*>", "", field))
+
+
+def _card_row(info, root, synced):
+    fields = {name: value["value"] for name, value in info["fields"].items()}
+    return (
+        info["cardId"],
+        info["note"],
+        root,
+        info["deckName"],
+        fields.get("Category", ""),
+        fields.get("Action", ""),
+        _plain(fields.get("Key", "")),
+        fields.get("Mode", ""),
+        info["interval"],
+        info["factor"],
+        info["reps"],
+        info["lapses"],
+        info["due"],
+        info["queue"],
+        info["type"],
+        synced,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Pulling
+# ---------------------------------------------------------------------------
+
+
+def pull(db, roots, full=False, chunk_size=ankipush.CHUNK_SIZE):
+    """Fetch reviews and card stats newer than what `db` holds; returns counts.
+
+    getLatestReviewID and cardReviews only look at cards directly in the deck
+    they are given, so every subdeck is asked separately (batched).
+    """
+    with ankipush.phase("decks"):
+        decks = [d for d in ankipush.invoke("deckNames") if _root_of(d, roots)]
+    state = {} if full else dict(db.execute("SELECT deck, last_review FROM state"))
+
+    with ankipush.phase("latest"), ankipush.Batch() as batch:
+        latest = {d: batch.add("getLatestReviewID", deck=d) for d in decks}
+    behind = [d for d in decks if latest[d].result > state.get(d, 0)]
+    with ankipush.phase("reviews"), ankipush.Batch() as batch:
+        fetched = {
+            d: batch.add("cardReviews", deck=d, startID=state.get(d, 0)) for d in behind
+        }
+        cards = {
+            root: batch.add("findCards", query=ankipush._search("deck", root))
+            for root in roots
+        }
+
+    touched, reviews = set(), 0
+    for deck, call in fetched.items():
+        # [reviewTime, cardID, usn, buttonPressed, newInterval, previousInterval,
+        #  newFactor, reviewDuration, reviewType]
+        rows = [(r[0], r[1], *r[3:9]) for r in call.result]
+        db.executemany("INSERT OR IGNORE INTO reviews VALUES (?,?,?,?,?,?,?,?)", rows)
+        touched.update(row[1] for row in rows)
+        reviews += len(rows)
+        last = max([latest[deck].result] + [row[0] for row in rows])
+        db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (deck, last))
+
+    # Cards deleted in Anki go, with their history; new ones get fetched below.
+    present = {cid for call in cards.values() for cid in call.result}
+    stored = {cid for (cid,) in db.execute("SELECT id FROM cards")}
+    gone = [(cid,) for cid in stored - present]
+    db.executemany("DELETE FROM cards WHERE id = ?", gone)
+    db.executemany("DELETE FROM reviews WHERE card = ?", gone)
+    wanted = sorted(present if full else (present - stored) | (touched & present))
+
+    synced, done = int(time.time()), 0
+    with ankipush.phase("cards"):
+        for chunk in ankipush._chunked(wanted, chunk_size):
+            rows = [
+                _card_row(info, _root_of(info["deckName"], roots), synced)
+                for info in ankipush.invoke("cardsInfo", cards=chunk)
+                if info and _root_of(info["deckName"], roots)
+            ]
+            db.executemany(
+                "INSERT OR REPLACE INTO cards VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                rows,
+            )
+            done += len(chunk)
+            ankipush._progress("cardsInfo", done, len(wanted))
+    db.commit()
+    return {"reviews": reviews, "cards": len(wanted), "removed": len(gone)}
+
+
+# ---------------------------------------------------------------------------
+# Queries. Both find a deck's cards through ix_cards_category and their
+# reviews through ix_reviews_card (a covering index), so their cost follows
+# the size of the decks asked about, not of the whole review log.
+# ---------------------------------------------------------------------------
+
+_STATS = """
+SELECT c.root_deck, c.category, c.action, c.key, c.mode, c.interval,
+       c.factor, c.lapses, COUNT(r.id) AS reviews,
+       COALESCE(SUM(r.ease = 1), 0) AS failed
+FROM cards c
+JOIN reviews r ON r.card = c.id AND r.id >= :since AND r.type < :recall
+{where}
+GROUP BY c.id
+"""
+
+WEAKEST = """
+WITH stats AS ({stats}),
+ranked AS (
+    SELECT *, ROW_NUMBER() OVER (
+        PARTITION BY root_deck, category
+        ORDER BY 1.0 * failed / reviews DESC, failed DESC, factor
+    ) AS rank
+    FROM stats
+    WHERE failed > 0
+)
+SELECT * FROM ranked WHERE rank <= :limit
+ORDER BY root_deck, category, rank
+"""
+
+CATEGORIES = """
+WITH stats AS ({stats})
+SELECT root_deck, category, COUNT(*) AS cards, SUM(reviews) AS reviews,
+       SUM(failed) AS failed, AVG(factor) AS factor, SUM(lapses) AS lapses
+FROM stats
+GROUP BY root_deck, category
+ORDER BY 1.0 * SUM(failed) / SUM(reviews) DESC, root_deck, category
+"""
+
+
+def _params(deck=None, since_days=None, limit=3):
+    since = 0
+    if since_days is not None:
+        since = int((time.time() - since_days * 86400) * 1000)
+    return {"deck": deck, "since": since, "recall": RECALL_TYPES, "limit": limit}
+
+
+def _query(template, deck):
+    # a literal filter rather than ":deck IS NULL OR ...", which no index serves
+    where = "WHERE c.root_deck = :deck" if deck is not None else ""
+    return template.format(stats=_STATS.format(where=where))
+
+
+def weakest(db, deck=None, since_days=None, limit=3):
+    """The `limit` most-failed bindings per deck and category (reviews since)."""
+    params = _params(deck, since_days, limit)
+    return db.execute(_query(WEAKEST, deck), params).fetchall()
+
+
+def categories(db, deck=None, since_days=None):
+    """Reviews, failures, mean ease and lapses per deck and category."""
+    return db.execute(_query(CATEGORIES, deck), _params(deck, since_days)).fetchall()
+
+
+def _rate(row):
+    return f"{100 * row['failed'] / row['reviews']:3.0f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mirror and query review history.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pull_cmd = commands.add_parser("pull", help="fetch new reviews from Anki")
+    pull_cmd.add_argument(
+        "--full", action="store_true", help="refetch all reviews and card stats"
+    )
+    pull_cmd.add_argument("--chunk-size", type=int, default=ankipush.CHUNK_SIZE)
+    for name in ("weakest", "categories"):
+        query = commands.add_parser(name)
+        query.add_argument("--deck", help="only this root deck")
+        query.add_argument(
+            "--since", type=float, metavar="DAYS", help="only reviews this recent"
+        )
+        if name == "weakest":
+            query.add_argument(
+                "-n", "--per-category", type=int, default=3, metavar="N"
+            )
+    args = parser.parse_args(argv)
+
+    db = connect()
+    if args.command == "pull":
+        started, requests = time.perf_counter(), ankipush.transport().requests
+        counts = pull(db, root_decks(), args.full, args.chunk_size)
+        requests = ankipush.transport().requests - requests
+        print(
+            f"Pulled {counts['reviews']} review(s), {counts['cards']} card(s)"
+            f" ({counts['removed']} removed) in"
+            f" {(time.perf_counter() - started) * 1000:.0f} ms over"
+            f" {requests} request(s)"
+        )
+    elif args.command == "weakest":
+        for row in weakest(db, args.deck, args.since, args.per_category):
+            print(
+                f"{row['root_deck']}::{row['category']:<18} {_rate(row)}"
+                f" {row['failed']:>3}/{row['reviews']:<3} {row['key']:<16}"
+                f" [{row['mode']}] {row['action']}"
+            )
+    else:
+        for row in categories(db, args.deck, args.since):
+            print(
+                f"{row['root_deck']}::{row['category']:<18} {_rate(row)}"
+                f" {row['failed']:>4}/{row['reviews']:<4} {row['cards']:>3} cards"
+                f"  ease {row['factor'] / 10:.0f}%  {row['lapses']} lapses"
+            )
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,9 @@ Grounded in this repo's tmux config: tmux/tmux.conf. The prefix is remapped to
 the backtick (`), and the answers render the full chord (e.g. "`  h") so you
 practice the whole sequence, not just the trailing key.
 
-`source = "config"` are bindings written in tmux/tmux.conf.
+`source = "config"` are bindings written in tmux/tmux.conf, which is parsed on
+every push (../extract.py): a `bind` with no card below is added with its
+command as the prompt.
 `source = "builtin"` are stock tmux defaults this config leaves in place — worth
 knowing, but not something you'll find in the dotfiles.
 
@@ -14,6 +16,14 @@ knowing, but not something you'll find in the dotfiles.
   - "Core"      — the prefix key itself
 """
 
+ROOT_DECK = "tmux"
+MODEL = "tmux-keybind"
+SUBDECKS = True
+
+# Config files whose bindings extract.py merges into CARDS (see ../extract.py):
+# a binding with no card below becomes a card in the mapped category.
+SOURCES = {"tmux/tmux.conf": "Prefix & Sessions"}
+
 # fmt: off
 CARDS = [
     # ---- Prefix & Sessions ----
@@ -1,23 +1,49 @@
 #!/usr/bin/env python3
 """Ansible dynamic inventory from OpenSSH Host aliases.
 
-This intentionally emits host aliases only. OpenSSH still resolves HostName,
-User, Port, IdentityFile, ProxyJump, and other connection details from the
-normal SSH config when Ansible opens the SSH connection.
+Every concrete Host alias becomes an inventory host. ansible_host stays the
+alias, so Ansible's ssh applies the whole config block (ProxyCommand,
+ForwardAgent, CertificateFile, ...) itself; what `ssh -G <alias>` reports is
+exported alongside as ssh_hostname, ssh_user, ssh_port, ssh_identity_file and
+ssh_proxy_jump, for groups and templates. A --config other than ~/.ssh/config
+is passed on as `-F` in ansible_ssh_common_args.
+SshConfig evaluates Host/Match blocks in-process; only aliases whose result
+depends on `Match exec` run `ssh -G`, concurrently (--ssh-g: all of them).
+--no-resolve emits bare aliases and leaves resolution to OpenSSH at
+connection time.
+
+Parsed files are cached in $XDG_CACHE_HOME/dotfiles/ssh_inventory.json, keyed on
+each file's resolved path, mtime and size, so a warm run only stats the include
+graph and re-parses files that changed. Resolved hostvars are cached alongside
+and reused until any file in the graph changes or --ssh-g is toggled. Set
+SSH_INVENTORY_CACHE=0 to bypass the cache.
 """
 
 from __future__ import annotations
 
 import argparse
+import fnmatch
+import functools
+import getpass
 import glob
 import json
 import os
+import re
 import shlex
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable
+from typing import IO, Iterable, NamedTuple
 
 
 WILDCARD_CHARS = set("*?[]")
+QUOTING_CHARS = set("\"'\\")
+CACHE_VERSION = 4
+SYSTEM_CONFIG = Path("/etc/ssh/ssh_config")
+USER_CONFIG = Path("~/.ssh/config")
+RESOLVE_TIMEOUT = 10
+RESOLVE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
 
 
 def split_config_line(line: str) -> list[str]:
@@ -25,6 +51,12 @@ def split_config_line(line: str) -> list[str]:
     if not line or line.startswith("#"):
         return []
 
+    # Most lines have no quoting; for those, plain whitespace splitting with
+    # shlex's comment rule (a '#' anywhere starts a comment) gives the same
+    # tokens at a fraction of the cost.
+    if QUOTING_CHARS.isdisjoint(line):
+        return line.split("#", 1)[0].split()
+
     try:
         return shlex.split(line, comments=True, posix=True)
     except ValueError:
@@ -51,14 +83,10 @@ def include_candidates(pattern: str, current_file: Path) -> Iterable[Path]:
             yield candidate
 
 
-def collect_hosts(config_file: Path, seen: set[Path] | None = None) -> set[str]:
-    seen = seen or set()
-    config_file = config_file.expanduser().resolve()
-    if config_file in seen or not config_file.is_file():
-        return set()
-
-    seen.add(config_file)
-    hosts: set[str] = set()
+def parse_config_file(config_file: Path) -> dict[str, list[str]]:
+    """Concrete Host aliases and raw Include patterns of one config file."""
+    hosts: list[str] = []
+    includes: list[str] = []
 
     for raw_line in config_file.read_text(encoding="utf-8", errors="ignore").splitlines():
         parts = split_config_line(raw_line)
@@ -69,30 +97,697 @@ def collect_hosts(config_file: Path, seen: set[Path] | None = None) -> set[str]:
         values = parts[1:]
 
         if keyword == "include":
-            for include_pattern in values:
-                for include_file in include_candidates(include_pattern, config_file):
-                    hosts.update(collect_hosts(include_file, seen))
+            includes.extend(values)
         elif keyword == "host":
-            hosts.update(pattern for pattern in values if is_concrete_host(pattern))
+            hosts.extend(pattern for pattern in values if is_concrete_host(pattern))
+
+    return {"hosts": hosts, "includes": includes}
+
+
+def default_cache_path() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return Path(cache_home) / "dotfiles" / "ssh_inventory.json"
+
+
+class ParseCache:
+    """Per-file parse results on disk, valid while (mtime_ns, size) match."""
+
+    def __init__(self, path: Path | None) -> None:
+        self.path = path
+        self.files: dict[str, dict] = {}
+        self.resolved: dict[str, object] = {}
+        self.used: set[str] = set()
+        self.dirty = False
+        if path is None:
+            return
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == CACHE_VERSION:
+            self.files = data.get("files", {})
+            self.resolved = data.get("resolved", {})
+
+    def parse(self, config_file: Path) -> dict[str, list[str]]:
+        key = str(config_file)
+        self.used.add(key)
+        stat = config_file.stat()
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        entry = self.files.get(key)
+        if entry is not None and entry.get("stamp") == stamp:
+            return entry
+        entry = {"stamp": stamp, **parse_config_file(config_file)}
+        self.files[key] = entry
+        self.dirty = True
+        return entry
+
+    def signature(self) -> list:
+        """Stamps of every file parsed this run, plus the system config."""
+        try:
+            stat = SYSTEM_CONFIG.stat()
+            system = [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            system = None
+        files = [[key, self.files[key]["stamp"]] for key in sorted(self.used)]
+        return [[str(SYSTEM_CONFIG), system], *files]
+
+    def resolved_hosts(self, mode: str) -> dict[str, dict]:
+        """Cached hostvars, if they were made by `mode` ("native" or "ssh-g")
+        and the include graph is unchanged since."""
+        if self.resolved.get("signature") != [mode, *self.signature()]:
+            return {}
+        return dict(self.resolved.get("hosts", {}))
+
+    def store_resolved(self, hosts: dict[str, dict], mode: str) -> None:
+        resolved = {"signature": [mode, *self.signature()], "hosts": hosts}
+        if resolved != self.resolved:
+            self.resolved = resolved
+            self.dirty = True
+
+    def save(self) -> None:
+        # Forget files that dropped out of the include graph
+        if self.files.keys() - self.used:
+            self.files = {k: v for k, v in self.files.items() if k in self.used}
+            self.dirty = True
+        if self.path is None or not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_text(
+                json.dumps(
+                    {
+                        "version": CACHE_VERSION,
+                        "files": self.files,
+                        "resolved": self.resolved,
+                    }
+                ),
+                encoding="utf-8",
+            )
+            os.replace(tmp, self.path)
+            self.dirty = False
+        except OSError:
+            pass
+
+
+def collect_host_sources(
+    config_file: Path,
+    seen: set[Path] | None = None,
+    cache: ParseCache | None = None,
+    sources: dict[str, Path] | None = None,
+) -> dict[str, Path]:
+    """Concrete Host aliases mapped to the config file that first names them."""
+    if seen is None:
+        seen = set()
+    if sources is None:
+        sources = {}
+    config_file = config_file.expanduser().resolve()
+    if config_file in seen or not config_file.is_file():
+        return sources
+
+    seen.add(config_file)
+    if cache is None:
+        parsed = parse_config_file(config_file)
+    else:
+        parsed = cache.parse(config_file)
+    for host in parsed["hosts"]:
+        sources.setdefault(host, config_file)
+
+    for include_pattern in parsed["includes"]:
+        for include_file in include_candidates(include_pattern, config_file):
+            collect_host_sources(include_file, seen, cache, sources)
+
+    return sources
+
+
+def collect_hosts(
+    config_file: Path,
+    seen: set[Path] | None = None,
+    cache: ParseCache | None = None,
+) -> set[str]:
+    """Concrete Host aliases; every config file visited is added to `seen`."""
+    return set(collect_host_sources(config_file, seen, cache))
+
+
+# Options ssh accumulates across blocks instead of keeping the first value
+MULTI_VALUE_OPTIONS = frozenset(
+    {
+        "certificatefile",
+        "dynamicforward",
+        "identityfile",
+        "localforward",
+        "remoteforward",
+        "sendenv",
+    }
+)
+DEFAULT_IDENTITY_FILES = (
+    "~/.ssh/id_rsa",
+    "~/.ssh/id_ecdsa",
+    "~/.ssh/id_ecdsa_sk",
+    "~/.ssh/id_ed25519",
+    "~/.ssh/id_ed25519_sk",
+)
+
+
+def split_keyword(parts: list[str]) -> tuple[str, list[str]]:
+    """`Key value`, `Key=value` and `Key = value` -> (lowercased key, values)."""
+    keyword, sep, rest = parts[0].partition("=")
+    values = ([rest] if rest else []) + parts[1:] if sep else parts[1:]
+    if not sep and values and values[0].startswith("="):
+        values = ([values[0][1:]] if values[0] != "=" else []) + values[1:]
+    return keyword.lower(), values
+
+
+def compile_patterns(
+    patterns: Iterable[str], ignore_case: bool = False
+) -> re.Pattern[str] | None:
+    """Glob patterns (without negations) as one compiled regex, or None."""
+    patterns = tuple(patterns)
+    if not patterns:
+        return None
+    return _compile_globs(patterns, ignore_case)
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_globs(patterns: tuple[str, ...], ignore_case: bool) -> re.Pattern[str]:
+    flags = re.DOTALL | (re.IGNORECASE if ignore_case else 0)
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns), flags)
+
+
+class PatternList:
+    """ssh's pattern-list semantics: some positive pattern matches and no
+    negated (!pattern) one does. Like ssh, Host lines and user names match
+    case-sensitively and Match host/originalhost case-insensitively."""
+
+    def __init__(self, patterns: Iterable[str], ignore_case: bool = False) -> None:
+        self.ignore_case = ignore_case
+        positive = []
+        negative = []
+        for pattern in patterns:
+            if pattern.startswith("!"):
+                negative.append(pattern[1:])
+            elif pattern:
+                positive.append(pattern)
+        fold = str.lower if ignore_case else str
+        self.literals = frozenset(fold(p) for p in positive if is_concrete_host(p))
+        self.wildcard = compile_patterns(
+            (p for p in positive if not is_concrete_host(p)), ignore_case
+        )
+        self.negative = compile_patterns(negative, ignore_case)
+
+        # Index keys for the wildcard patterns: the literal text a match must
+        # start (web-*) or end (*.example.com) with. One pattern without
+        # either (*, *foo*) makes the whole list unindexable.
+        self.prefixes: set[str] = set()
+        self.suffixes: set[str] = set()
+        self.indexable = True
+        for pattern in positive:
+            if is_concrete_host(pattern):
+                continue
+            wild = [i for i, char in enumerate(pattern) if char in WILDCARD_CHARS]
+            if wild[0] > 0:
+                self.prefixes.add(fold(pattern[: wild[0]]))
+            elif wild[-1] < len(pattern) - 1:
+                self.suffixes.add(fold(pattern[wild[-1] + 1 :]))
+            else:
+                self.indexable = False
+
+    def matches(self, value: str) -> bool:
+        if self.ignore_case:
+            value = value.lower()
+        if self.negative is not None and self.negative.match(value):
+            return False
+        return value in self.literals or bool(
+            self.wildcard is not None and self.wildcard.match(value)
+        )
+
+
+@functools.lru_cache(maxsize=1)
+def local_user() -> str:
+    return getpass.getuser()
+
+
+class Condition(NamedTuple):
+    """One Host line or one Match criterion. `negated` is Match's `!criterion`."""
+
+    # host (a Host line, matched against the alias), or a Match criterion:
+    # hostname (Match host), originalhost, user, localuser, all, canonical,
+    # final, exec
+    kind: str
+    patterns: PatternList | None = None
+    negated: bool = False
+
+
+class Rule(NamedTuple):
+    conditions: tuple[Condition, ...]  # all must hold (outer Include blocks too)
+    options: tuple[tuple[str, tuple[str, ...]], ...]
+
+
+class Evaluation(NamedTuple):
+    options: dict[str, list[str]]
+    exact: bool  # False when a criterion (Match exec) could not be evaluated
+
+
+def parse_match(values: list[str]) -> tuple[Condition, ...]:
+    conditions = []
+    i = 0
+    while i < len(values):
+        word = values[i]
+        negated = word.startswith("!")
+        kind = word.lstrip("!").lower()
+        if kind == "host":
+            kind = "hostname"
+        i += 1
+        if kind in ("all", "canonical", "final"):
+            conditions.append(Condition(kind, None, negated))
+            continue
+        arg = values[i] if i < len(values) else ""
+        i += 1
+        ignore_case = kind in ("hostname", "originalhost")
+        patterns = None if kind == "exec" else PatternList(arg.split(","), ignore_case)
+        conditions.append(Condition(kind, patterns, negated))
+    return tuple(conditions)
+
+
+class SshConfig:
+    """A compiled OpenSSH client config: evaluate aliases without running ssh.
+
+    Blocks become Rules in file order, with Include expanded in place (rules of
+    an included file also carry the enclosing block's conditions). Rules with a
+    Host line are indexed by its literal hosts and by the literal prefixes and
+    suffixes of its wildcards; Match, unconditional and catch-all (Host *)
+    rules are checked for every alias. Like ssh, the first value seen for an
+    option wins.
+    """
+
+    def __init__(self, rules: list[Rule]) -> None:
+        self.rules = rules
+        self.by_host: dict[str, list[int]] = {}
+        self.by_prefix: dict[str, list[int]] = {}
+        self.by_suffix: dict[str, list[int]] = {}
+        self.general: list[int] = []
+        for index, rule in enumerate(rules):
+            patterns = self._host_patterns(rule)
+            if patterns is None:
+                self.general.append(index)
+                continue
+            for key, table in (
+                (patterns.literals, self.by_host),
+                (patterns.prefixes, self.by_prefix),
+                (patterns.suffixes, self.by_suffix),
+            ):
+                for text in key:
+                    table.setdefault(text, []).append(index)
+        self.prefix_lengths = sorted({len(k) for k in self.by_prefix})
+        self.suffix_lengths = sorted({len(k) for k in self.by_suffix})
+
+    @staticmethod
+    def _host_patterns(rule: Rule) -> PatternList | None:
+        """The Host line that limits which aliases a rule can match, if any.
+
+        Host lines are case-sensitive, so the index keys are too.
+        """
+        for condition in rule.conditions:
+            if condition.kind == "host" and condition.patterns.indexable:
+                return condition.patterns
+        return None
 
-    return hosts
+    def candidates(self, alias: str) -> list[int]:
+        """Indices of the rules that can apply to `alias`, in file order."""
+        found = set(self.by_host.get(alias, ()))
+        found.update(self.general)
+        for length in self.prefix_lengths:
+            if length > len(alias):
+                break
+            found.update(self.by_prefix.get(alias[:length], ()))
+        for length in self.suffix_lengths:
+            if length > len(alias):
+                break
+            found.update(self.by_suffix.get(alias[-length:], ()))
+        return sorted(found)
 
+    @classmethod
+    def from_files(cls, *config_files: Path) -> SshConfig:
+        rules: list[Rule] = []
+        seen: set[Path] = set()
+        for config_file in config_files:
+            cls._compile(config_file.expanduser(), (), rules, seen)
+        return cls(rules)
 
-def build_inventory(config_path: Path) -> dict[str, object]:
-    hosts = sorted(collect_hosts(config_path))
-    return {
+    @classmethod
+    def _compile(
+        cls,
+        config_file: Path,
+        outer: tuple[Condition, ...],
+        rules: list[Rule],
+        seen: set[Path],
+    ) -> None:
+        config_file = config_file.resolve()
+        if config_file in seen or not config_file.is_file():
+            return
+        seen.add(config_file)
+
+        conditions = outer
+        options: list[tuple[str, tuple[str, ...]]] = []
+
+        def flush() -> None:
+            if options:
+                rules.append(Rule(conditions, tuple(options)))
+                options.clear()
+
+        text = config_file.read_text(encoding="utf-8", errors="ignore")
+        for raw_line in text.splitlines():
+            parts = split_config_line(raw_line)
+            if not parts:
+                continue
+            keyword, values = split_keyword(parts)
+            if keyword == "host":
+                flush()
+                conditions = outer + (Condition("host", PatternList(values)),)
+            elif keyword == "match":
+                flush()
+                conditions = outer + parse_match(values)
+            elif keyword == "include":
+                flush()
+                for pattern in values:
+                    for include_file in include_candidates(pattern, config_file):
+                        cls._compile(include_file, conditions, rules, seen)
+            else:
+                options.append((keyword, tuple(values)))
+        flush()
+
+    def evaluate(self, alias: str) -> Evaluation:
+        """Effective options for `alias`, keyed like `ssh -G` output."""
+        options: dict[str, list[str]] = {}
+        exact = True
+        user = local_user()
+        for index in self.candidates(alias):
+            rule = self.rules[index]
+            matched = True
+            for condition in rule.conditions:
+                hit = self._holds(condition, alias, options, user)
+                if not hit:
+                    # Unknown only matters if the rule could still set something
+                    if hit is None and any(
+                        key in MULTI_VALUE_OPTIONS or key not in options
+                        for key, _ in rule.options
+                    ):
+                        exact = False
+                    matched = False
+                    break
+            if not matched:
+                continue
+            for keyword, values in rule.options:
+                if keyword in MULTI_VALUE_OPTIONS:
+                    options.setdefault(keyword, []).extend(values)
+                elif keyword not in options and values:
+                    options[keyword] = list(values)
+        return Evaluation(self._finish(alias, options, user), exact)
+
+    @staticmethod
+    def _holds(
+        condition: Condition,
+        alias: str,
+        options: dict[str, list[str]],
+        login: str,
+    ) -> bool | None:
+        kind = condition.kind
+        if kind == "host":
+            return condition.patterns.matches(alias)
+        if kind == "all":
+            hit = True
+        elif kind in ("canonical", "final"):
+            # ssh -G runs the final pass; canonical needs CanonicalizeHostname
+            hit = kind == "final" or "canonicalizehostname" in options
+        elif kind == "hostname":
+            hostname = options.get("hostname", [alias])[0]
+            hit = condition.patterns.matches(expand_tokens(hostname, alias))
+        elif kind == "originalhost":
+            hit = condition.patterns.matches(alias)
+        elif kind == "user":
+            hit = condition.patterns.matches(options.get("user", [login])[0])
+        elif kind == "localuser":
+            hit = condition.patterns.matches(login)
+        else:
+            return None  # exec and anything newer: only ssh itself can tell
+        return hit != condition.negated
+
+    @staticmethod
+    def _finish(
+        alias: str, options: dict[str, list[str]], login: str
+    ) -> dict[str, list[str]]:
+        hostname = expand_tokens(options.get("hostname", ["%h"])[0], alias).lower()
+        user = options.get("user", [login])[0]
+        options["hostname"] = [hostname]
+        options["user"] = [user]
+        options.setdefault("port", ["22"])
+        # Unexpanded, as ssh -G prints them; hostvars_for expands tokens
+        if not options.get("identityfile"):
+            options["identityfile"] = list(DEFAULT_IDENTITY_FILES)
+        return options
+
+
+def expand_tokens(value: str, alias: str, tokens: dict[str, str] | None = None) -> str:
+    """Expand ssh_config %-tokens (%h, %n, %r, %u, %d, %%) and a leading ~."""
+    table = {"h": alias, "n": alias, "d": os.path.expanduser("~"), "%": "%"}
+    table.update(tokens or {})
+    value = re.sub(r"%(.)", lambda m: table.get(m.group(1), m.group(0)), value)
+    return os.path.expanduser(value)
+
+
+def ssh_options(alias: str, config_path: Path | None = None) -> dict[str, list[str]]:
+    """Effective client options for `alias` as reported by `ssh -G`.
+
+    With `config_path`, ssh reads that file (`-F`) instead of ~/.ssh/config.
+    """
+    config_args = ["-F", str(config_path.expanduser())] if config_path else []
+    try:
+        output = subprocess.run(
+            ["ssh", "-G", *config_args, alias],
+            capture_output=True,
+            text=True,
+            timeout=RESOLVE_TIMEOUT,
+            stdin=subprocess.DEVNULL,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return {}
+
+    options: dict[str, list[str]] = {}
+    for line in output.splitlines():
+        key, _, value = line.partition(" ")
+        if value:
+            options.setdefault(key.lower(), []).append(value.strip())
+    return options
+
+
+def connection_vars(alias: str, config_path: Path | None = None) -> dict[str, object]:
+    """ansible_host as the alias itself, plus `-F` for a non-default config."""
+    hostvars: dict[str, object] = {"ansible_host": alias}
+    if config_path is not None:
+        path = config_path.expanduser()
+        if path.resolve() != USER_CONFIG.expanduser().resolve():
+            hostvars["ansible_ssh_common_args"] = f"-F {shlex.quote(str(path))}"
+    return hostvars
+
+
+def hostvars_for(
+    alias: str, options: dict[str, list[str]], config_path: Path | None = None
+) -> dict[str, object]:
+    """connection_vars, plus the resolved options as ssh_* metadata.
+
+    Only metadata: setting ansible_host/user/port from them would make
+    Ansible connect to the bare HostName and skip every option not exported.
+    """
+    hostvars = connection_vars(alias, config_path)
+    if not options.get("hostname"):
+        return hostvars
+
+    hostvars["ssh_hostname"] = options["hostname"][0]
+    if options.get("user"):
+        hostvars["ssh_user"] = options["user"][0]
+    if options.get("port"):
+        hostvars["ssh_port"] = int(options["port"][0])
+
+    # ssh -G also lists the default identities; keep the first that exists
+    tokens = {
+        "h": options["hostname"][0],
+        "r": options.get("user", [""])[0],
+        "u": local_user(),
+    }
+    for identity in options.get("identityfile", []):
+        path = expand_tokens(identity, alias, tokens)
+        if os.path.isfile(path):
+            hostvars["ssh_identity_file"] = path
+            break
+
+    proxy_jump = options.get("proxyjump", ["none"])[0]
+    if proxy_jump != "none":
+        hostvars["ssh_proxy_jump"] = proxy_jump
+    return hostvars
+
+
+def resolve_hosts(
+    aliases: Iterable[str],
+    workers: int = RESOLVE_WORKERS,
+    config: SshConfig | None = None,
+    config_path: Path | None = None,
+) -> dict[str, dict[str, object]]:
+    """Hostvars for every alias.
+
+    With a compiled `config`, aliases are evaluated in-process; only those
+    whose result hinges on something ssh alone can evaluate (Match exec) fall
+    back to `ssh -G -F config_path`, run `workers` at a time.
+    """
+    aliases = sorted(aliases)
+    resolved: dict[str, dict[str, object]] = {}
+    if config is not None:
+        for alias in aliases:
+            evaluation = config.evaluate(alias)
+            if evaluation.exact:
+                resolved[alias] = hostvars_for(
+                    alias, evaluation.options, config_path
+                )
+    remaining = [alias for alias in aliases if alias not in resolved]
+    if remaining:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            options = pool.map(
+                lambda alias: ssh_options(alias, config_path), remaining
+            )
+            for alias, opts in zip(remaining, options):
+                resolved[alias] = hostvars_for(alias, opts, config_path)
+    return resolved
+
+
+def cached_hostvars(
+    aliases: Iterable[str],
+    cache: ParseCache,
+    config_path: Path,
+    native: bool = True,
+) -> dict[str, dict[str, object]]:
+    """Resolve only the aliases missing from the cache's still-valid hostvars.
+
+    Missing aliases are evaluated against `config_path` compiled in-process
+    when `native`, otherwise each runs `ssh -G -F config_path`.
+    """
+    mode = "native" if native else "ssh-g"
+    known = cache.resolved_hosts(mode)
+    missing = set(aliases) - known.keys()
+    config = None
+    if missing and native:
+        config = SshConfig.from_files(config_path, SYSTEM_CONFIG)
+    known.update(resolve_hosts(missing, config=config, config_path=config_path))
+    cache.store_resolved(known, mode)
+    return known
+
+
+def group_name(*parts: str) -> str:
+    """An Ansible-safe group name: letters, digits and underscores."""
+    return re.sub(r"\W+", "_", "_".join(parts)).strip("_").lower()
+
+
+def jump_host(proxy_jump: str) -> str:
+    """The first hop of a ProxyJump value, without user@ and :port."""
+    hop = proxy_jump.split(",", 1)[0]
+    if hop.startswith("ssh://"):
+        hop = hop[len("ssh://") :]
+    hop = hop.rpartition("@")[2]
+    if hop.startswith("["):
+        return hop[1:].split("]", 1)[0]
+    return hop.split(":", 1)[0]
+
+
+def derive_groups(
+    hosts: list[str],
+    sources: dict[str, Path],
+    hostvars: dict[str, dict[str, object]],
+    config_file: Path,
+) -> dict[str, list[str]]:
+    """Groups from config structure and naming.
+
+    - include_<file>:  hosts declared in an Include'd file
+    - via_<bastion>:   hosts reached through that ProxyJump first hop
+    - prefix_<word>:   aliases starting with `word` + one of - . _  (2+ hosts)
+    - suffix_<word>:   aliases ending with one of - . _ + `word` (2+ hosts)
+    """
+    root = config_file.expanduser().resolve()
+    groups: dict[str, set[str]] = {}
+    affixes: dict[str, set[str]] = {}
+    for host in hosts:
+        source = sources.get(host)
+        if source is not None and source != root:
+            groups.setdefault(group_name("include", source.stem), set()).add(host)
+
+        proxy_jump = hostvars.get(host, {}).get("ssh_proxy_jump")
+        if proxy_jump:
+            groups.setdefault(group_name("via", jump_host(proxy_jump)), set()).add(host)
+
+        words = [w for w in re.split(r"[-._]+", host) if w]
+        if len(words) > 1:
+            affixes.setdefault(group_name("prefix", words[0]), set()).add(host)
+            if not words[-1].isdigit():
+                affixes.setdefault(group_name("suffix", words[-1]), set()).add(host)
+
+    for name, members in affixes.items():
+        if len(members) > 1:
+            groups.setdefault(name, set()).update(members)
+    return {name: sorted(members) for name, members in sorted(groups.items())}
+
+
+def build_inventory(
+    config_path: Path,
+    cache_path: Path | None = None,
+    resolve: bool = True,
+    native: bool = True,
+) -> dict[str, object]:
+    cache = ParseCache(cache_path)
+    sources = collect_host_sources(config_path, cache=cache)
+    hosts = sorted(sources)
+    if resolve:
+        resolved = cached_hostvars(hosts, cache, config_path, native)
+        hostvars = {host: resolved[host] for host in hosts}
+    else:
+        hostvars = {host: connection_vars(host, config_path) for host in hosts}
+    cache.save()
+    inventory: dict[str, object] = {
         "_meta": {
-            "hostvars": {
-                host: {
-                    "ansible_host": host,
-                }
-                for host in hosts
-            },
+            "hostvars": hostvars,
         },
         "ssh_config": {
             "hosts": hosts,
         },
     }
+    for name, members in derive_groups(hosts, sources, hostvars, config_path).items():
+        inventory.setdefault(name, {"hosts": members})
+    return inventory
+
+
+OUTPUT_FORMATS = ("pretty", "compact", "stream")
+
+
+def write_inventory(inventory: dict, out: IO[str], output_format: str) -> None:
+    """pretty: indented and sorted; compact: one line, no spaces; stream:
+    compact JSON written host by host, never building the whole document."""
+    if output_format == "pretty":
+        out.write(json.dumps(inventory, indent=2, sort_keys=True) + "\n")
+        return
+    if output_format == "compact":
+        out.write(json.dumps(inventory, separators=(",", ":")) + "\n")
+        return
+
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+    out.write('{"_meta":{"hostvars":{')
+    for i, (host, hostvars) in enumerate(inventory["_meta"]["hostvars"].items()):
+        out.write(("," if i else "") + encode(host) + ":" + encode(hostvars))
+    out.write("}}")
+    for name, group in inventory.items():
+        if name == "_meta":
+            continue
+        out.write("," + encode(name) + ':{"hosts":[')
+        for i, host in enumerate(group["hosts"]):
+            out.write(("," if i else "") + encode(host))
+        out.write("]}")
+    out.write("}\n")
 
 
 def main() -> None:
@@ -104,13 +799,49 @@ def main() -> None:
         default=os.environ.get("SSH_CONFIG", "~/.ssh/config"),
         help="SSH config path. Defaults to SSH_CONFIG or ~/.ssh/config.",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=os.environ.get("SSH_INVENTORY_CACHE") == "0",
+        help="Parse and resolve everything instead of using the cache.",
+    )
+    parser.add_argument(
+        "--no-resolve",
+        action="store_true",
+        help="Emit bare aliases; OpenSSH resolves them at connection time.",
+    )
+    parser.add_argument(
+        "--ssh-g",
+        action="store_true",
+        help="Resolve every alias with `ssh -G` instead of the built-in evaluator.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default=os.environ.get("SSH_INVENTORY_FORMAT", "pretty"),
+        help="JSON layout. Defaults to SSH_INVENTORY_FORMAT or pretty.",
+    )
     args = parser.parse_args()
 
+    cache_path = None if args.no_cache else default_cache_path()
+
     if args.host:
-        print(json.dumps({}))
+        if args.no_resolve:
+            print(json.dumps(connection_vars(args.host, Path(args.config))))
+            return
+        cache = ParseCache(cache_path)
+        collect_hosts(Path(args.config), cache=cache)
+        hostvars = cached_hostvars(
+            [args.host], cache, Path(args.config), not args.ssh_g
+        )[args.host]
+        cache.save()
+        print(json.dumps(hostvars, indent=2, sort_keys=True))
         return
 
-    print(json.dumps(build_inventory(Path(args.config)), indent=2, sort_keys=True))
+    inventory = build_inventory(
+        Path(args.config), cache_path, not args.no_resolve, not args.ssh_g
+    )
+    write_inventory(inventory, sys.stdout, args.format)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,21 @@
 # Custom tab bar for kitty
 # Features: tab index, process name, SSH indicator, zoom indicator
 
+import atexit
+import functools
+import getpass
+import glob
+import importlib.util
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
+
 from kitty.boss import get_boss
 from kitty.fast_data_types import Screen
 from kitty.tab_bar import DrawData, ExtraData, TabBarData, as_rgb
@@ -21,109 +36,547 @@ SEP = ""
 
 # Minimum tab width (characters, excluding separators)
 MIN_TAB_WIDTH = 18
+# Narrowest a tab is squeezed to when the whole bar does not fit
+MIN_SHRUNK_WIDTH = 8
+
+# Lay out the whole bar at once (widths shared across tabs in proportion to
+# their titles) instead of sizing each tab on its own. Falls back to per-tab
+# layout when kitty does not expose the tab list.
+WHOLE_BAR_LAYOUT = True
+
+# Seconds a window's foreground-process labels stay cached. tab_watcher.py drops
+# entries on child exit / title / focus / command start-stop events, so the TTL
+# only bounds staleness for changes kitty sends no event for.
+PROC_CACHE_TTL = 2.0
+
+# Name of the module tab_bar.py and tab_watcher.py share state through. kitty
+# loads both files with runpy, so sys.modules is their only common namespace.
+STATE_MODULE = "dotfiles_kitty_tab_state"
+
+
+def _shared_state() -> types.ModuleType:
+    state = sys.modules.get(STATE_MODULE)
+    if state is None:
+        state = types.ModuleType(STATE_MODULE)
+        state.proc_cache = {}  # window id -> (timestamp, procs, name, is_ssh, host)
+        sys.modules[STATE_MODULE] = state
+    return state
+
+
+_proc_cache: dict[int, tuple] = _shared_state().proc_cache
+
+
+@dataclass
+class TabContext:
+    """What draw_tab needs to know about one tab, gathered once per redraw."""
+
+    window: Any = None
+    procs: list = field(default_factory=list)
+    is_ssh: bool = False
+    ssh_host: str = ""
+    proc_name: str = ""
+
+
+class _Frame:
+    """One tab bar redraw: the tab manager and a context per tab id.
+
+    kitty draws the tabs of a bar in order starting at index 1, so a new frame
+    starts there; every consumer within the redraw shares the same snapshot
+    instead of repeating the boss lookup chain and the /proc scan.
+    """
+
+    def __init__(self, tab_manager: Any = None) -> None:
+        self.tab_manager = tab_manager
+        self.contexts: dict[int, TabContext] = {}
+        self.titles: dict[int, tuple[str, str, str, str]] = {}
+        self.widths: dict[int, int] | None = None  # tab id -> title cells
 
 
-def _get_proc_name(tab: TabBarData) -> str:
-    """Get the foreground process name for this tab."""
+_frame = _Frame()
+
+
+def _begin_frame() -> None:
+    global _frame
+    tab_manager = None
     try:
         boss = get_boss()
-        if boss is None:
-            return ""
-        tm = boss.active_tab_manager
-        if tm is None:
-            return ""
-        kitty_tab = tm.tab_for_id(tab.tab_id)
-        if kitty_tab is None:
-            return ""
-        active_window = kitty_tab.active_window
-        if active_window is None:
-            return ""
-        procs = active_window.child.foreground_processes
-        if procs:
-            proc = sorted(procs, key=lambda p: p["pid"])[-1]
-            cmdline = proc.get("cmdline", [])
-            if cmdline:
-                return cmdline[0].split("/")[-1]
+        if boss is not None:
+            tab_manager = boss.active_tab_manager
     except Exception:
         pass
-    return ""
-
+    _frame = _Frame(tab_manager)
 
-def _get_ssh_info(tab: TabBarData) -> tuple[bool, str]:
-    """Check if this tab is an SSH session and get hostname.
 
-    Returns: (is_ssh, hostname) tuple
-    """
+def _build_context(tab: TabBarData) -> TabContext:
+    ctx = TabContext()
     try:
-        boss = get_boss()
-        if boss is None:
-            return False, ""
-        tm = boss.active_tab_manager
-        if tm is None:
-            return False, ""
-        kitty_tab = tm.tab_for_id(tab.tab_id)
-        if kitty_tab is None:
-            return False, ""
-        active_window = kitty_tab.active_window
-        if active_window is None:
-            return False, ""
-
-        # SSH kitten - parse hostname from cmdline
-        ssh_cmdline = active_window.ssh_kitten_cmdline()
-        if ssh_cmdline:
-            # Format: ['kitten', 'ssh', 'hostname', ...]
-            for i, arg in enumerate(ssh_cmdline):
-                if arg == "ssh" and i + 1 < len(ssh_cmdline):
-                    host = ssh_cmdline[i + 1]
-                    # Strip user@ prefix if present
-                    if "@" in host:
-                        host = host.split("@")[-1]
-                    return True, host
-            return True, "remote"
-
-        # Regular SSH - check child_is_remote
-        if active_window.child_is_remote:
-            # Try to get hostname from foreground processes
-            procs = active_window.child.foreground_processes
-            for proc in procs:
-                cmdline = proc.get("cmdline", [])
-                if cmdline and "ssh" in cmdline[0]:
-                    # Parse hostname from ssh command
-                    host = _parse_ssh_host(cmdline)
-                    if host:
-                        return True, host
-            return True, "remote"
-
-        # Check foreground process for ssh
-        procs = active_window.child.foreground_processes
-        for proc in procs:
-            cmdline = proc.get("cmdline", [])
-            if cmdline and "ssh" in cmdline[0]:
-                host = _parse_ssh_host(cmdline)
-                return True, host if host else "remote"
+        tm = _frame.tab_manager
+        kitty_tab = tm.tab_for_id(tab.tab_id) if tm is not None else None
+        window = kitty_tab.active_window if kitty_tab is not None else None
+        if window is None:
+            return ctx
+        ctx.window = window
+        now = time.monotonic()
+        cached = _proc_cache.get(window.id)
+        if cached is not None and now - cached[0] < PROC_CACHE_TTL:
+            _, ctx.procs, ctx.proc_name, ctx.is_ssh, ctx.ssh_host = cached
+            return ctx
+        ctx.procs = list(window.child.foreground_processes or ())
+        ctx.proc_name = _proc_name_from(ctx.procs)
+        ctx.is_ssh, ctx.ssh_host = _ssh_info_from(window, ctx.procs)
+        _proc_cache[window.id] = (
+            now,
+            ctx.procs,
+            ctx.proc_name,
+            ctx.is_ssh,
+            ctx.ssh_host,
+        )
     except Exception:
         pass
+    return ctx
+
+
+def _tab_context(tab: TabBarData) -> TabContext:
+    """The tab's context for the current redraw, built on first use."""
+    ctx = _frame.contexts.get(tab.tab_id)
+    if ctx is None:
+        ctx = _frame.contexts[tab.tab_id] = _build_context(tab)
+    return ctx
+
+
+def _proc_name_from(procs: list) -> str:
+    if procs:
+        proc = sorted(procs, key=lambda p: p["pid"])[-1]
+        cmdline = proc.get("cmdline", [])
+        if cmdline:
+            return cmdline[0].split("/")[-1]
+    return ""
+
+
+def _ssh_info_from(window: Any, procs: list) -> tuple[bool, str]:
+    # SSH kitten: kitty knows the command line it launched
+    ssh_cmdline = window.ssh_kitten_cmdline()
+    if ssh_cmdline:
+        return True, _ssh_label(_parse_ssh_host(ssh_cmdline)) or "remote"
+
+    # Regular ssh in the foreground (child_is_remote covers ssh exec'd by the
+    # shell; either way the host comes from the ssh process's argv)
+    for proc in procs:
+        cmdline = proc.get("cmdline", [])
+        if _is_ssh_argv(tuple(cmdline)):
+            host = _ssh_label(_parse_ssh_host(cmdline))
+            if host or not window.child_is_remote:
+                return True, host or "remote"
+    if window.child_is_remote:
+        return True, "remote"
     return False, ""
 
 
+# ----------------------------------------------------------------------------
+# ssh argv parsing: the OpenSSH getopt grammar (ssh.c), ssh:// URIs, -o HostName
+# and `kitten ssh` argv. Results are memoized on the argv tuple, so a tab only
+# pays for parsing when its command line changes.
+# ----------------------------------------------------------------------------
+
+# Single-letter ssh options that take an argument (attached or as the next arg)
+SSH_ARG_FLAGS = frozenset("BDEFIJLOPQRSWbceilmopw")
+
+
+def _is_ssh_argv(argv: tuple) -> bool:
+    """ssh itself, or `kitten ssh` / `kitty +kitten ssh`."""
+    if not argv:
+        return False
+    prog = argv[0].rsplit("/", 1)[-1]
+    if prog == "ssh":
+        return True
+    return prog in ("kitten", "kitty") and "ssh" in argv[1:3]
+
+
+def _split_user_host(dest: str) -> str:
+    """[user@]host[:port] or ssh://[user@]host[:port] -> host."""
+    if dest.startswith("ssh://"):
+        dest = dest[len("ssh://"):].split("/", 1)[0]
+        dest = dest.rpartition("@")[2]
+        if dest.startswith("["):  # ssh://[::1]:22
+            return dest[1:].split("]", 1)[0]
+        return dest.split(":", 1)[0]
+    return dest.rpartition("@")[2]
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_ssh_argv(argv: tuple) -> str:
+    args = list(argv[1:])
+    if argv and argv[0].rsplit("/", 1)[-1] in ("kitten", "kitty"):
+        # kitten ssh [--kitten key=val ...] <ssh args>
+        args = args[args.index("ssh") + 1:] if "ssh" in args else []
+        while args and args[0].startswith("--kitten"):
+            del args[: 1 if "=" in args[0] else 2]
+
+    host, hostname = "", ""
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if arg == "--":
+            if i < len(args) and not host:
+                host = args[i]
+            break
+        if not arg.startswith("-") or arg == "-":
+            if not host:
+                host = arg
+                # Options may follow the destination only before the command
+                # (OpenSSH reorders argv this way), so keep scanning flags
+                continue
+            break
+        # A cluster like -vvp22 or -4A: flags until one that takes an argument
+        for j, flag in enumerate(arg[1:], 1):
+            if flag not in SSH_ARG_FLAGS:
+                continue
+            value = arg[j + 1:]
+            if not value and i < len(args):
+                value = args[i]
+                i += 1
+            if flag == "o":
+                key, _, val = value.replace("=", " ", 1).partition(" ")
+                if key.lower() == "hostname" and val.strip():
+                    hostname = val.strip()
+            break
+    if hostname:
+        return hostname
+    return _split_user_host(host) if host else ""
+
+
 def _parse_ssh_host(cmdline: list) -> str:
-    """Parse hostname from ssh command line."""
-    # Skip flags and find the hostname argument
-    skip_next = False
-    for arg in cmdline[1:]:  # Skip 'ssh' itself
-        if skip_next:
-            skip_next = False
-            continue
-        if arg.startswith("-"):
-            # Flags that take an argument
-            if arg in ("-p", "-l", "-i", "-o", "-F", "-J", "-L", "-R", "-D"):
-                skip_next = True
-            continue
-        # Found hostname (possibly user@host)
-        if "@" in arg:
-            return arg.split("@")[-1]
-        return arg
-    return ""
+    """Parse hostname from an ssh or `kitten ssh` command line."""
+    return _parse_ssh_argv(tuple(cmdline))
+
+
+# ----------------------------------------------------------------------------
+# ssh alias resolution: a background thread runs `ssh -G <alias>` for every
+# Host alias in ~/.ssh/config (walked with ansible/inventory/ssh_config.py) and
+# for aliases seen in tabs but not in the config. The render path only reads
+# the finished index; a miss shows the alias as typed and queues it.
+# ----------------------------------------------------------------------------
+
+SSH_CONFIG = os.environ.get("SSH_CONFIG", "~/.ssh/config")
+# Point `ssh -G` at the same file the host list comes from
+SSH_CONFIG_ARGS = (
+    ("-F", os.path.expanduser(SSH_CONFIG)) if "SSH_CONFIG" in os.environ else ()
+)
+SSH_SYSTEM_CONFIG = "/etc/ssh/ssh_config"
+# Seconds between config mtime checks in the background thread
+SSH_INDEX_RECHECK = 5.0
+SSH_RESOLVE_TIMEOUT = 5.0
+SSH_RESOLVE_WORKERS = 4
+
+
+def _load_ssh_config_module() -> types.ModuleType | None:
+    """ansible/inventory/ssh_config.py, found through the tab_bar.py symlink."""
+    try:
+        repo = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+        path = os.path.join(repo, "ansible", "inventory", "ssh_config.py")
+        spec = importlib.util.spec_from_file_location("_dotfiles_ssh_config", path)
+        if spec is None or not os.path.isfile(path):
+            return None
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    except Exception:
+        return None
+
+
+def _ssh_resolve(alias: str) -> tuple[str, str, str] | None:
+    """(user, hostname, proxyjump) from `ssh -G [-F SSH_CONFIG] alias`, or None."""
+    try:
+        out = subprocess.run(
+            ["ssh", "-G", *SSH_CONFIG_ARGS, alias],
+            capture_output=True,
+            text=True,
+            timeout=SSH_RESOLVE_TIMEOUT,
+            stdin=subprocess.DEVNULL,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    opts = {}
+    for line in out.splitlines():
+        key, _, value = line.partition(" ")
+        opts.setdefault(key.lower(), value.strip())
+    if "hostname" not in opts:
+        return None
+    jump = opts.get("proxyjump", "")
+    return opts.get("user", ""), opts["hostname"], "" if jump == "none" else jump
+
+
+class _SshIndex:
+    """alias -> (user, hostname, proxyjump), rebuilt when a config file changes
+    or an Include glob starts matching a different set of files."""
+
+    def __init__(self) -> None:
+        self.entries: dict[str, tuple[str, str, str] | None] = {}
+        self.pending: set[str] = set()
+        self.mtimes: dict[str, int | None] = {}
+        self.includes: dict[str, list[str]] = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def get(self, alias: str) -> tuple[str, str, str] | None:
+        try:
+            return self.entries[alias]
+        except KeyError:
+            pass
+        with self.lock:
+            self.pending.add(alias)
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name="tab-bar-ssh-index", daemon=True
+                )
+                self.thread.start()
+        self.wake.set()
+        return None
+
+    def _run(self) -> None:
+        module = _load_ssh_config_module()
+        while True:
+            try:
+                self._refresh(module)
+            except Exception:
+                pass
+            self.wake.wait(SSH_INDEX_RECHECK)
+            self.wake.clear()
+
+    def _stat(self) -> dict[str, int | None]:
+        mtimes = {}
+        for path in self.mtimes:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def _expand(self) -> dict[str, list[str]]:
+        # A file dropped into an Include'd directory changes no watched mtime
+        return {pattern: sorted(glob.glob(pattern)) for pattern in self.includes}
+
+    def _stale(self) -> bool:
+        return (
+            not self.mtimes
+            or self._stat() != self.mtimes
+            or self._expand() != self.includes
+        )
+
+    def _refresh(self, module: types.ModuleType | None) -> None:
+        if self._stale():
+            config = os.path.expanduser(SSH_CONFIG)
+            seen: set = set()
+            aliases: set[str] = set()
+            patterns: set[str] = set()
+            if module is not None:
+                cache = module.ParseCache(None)
+                aliases = module.collect_hosts(module.Path(config), seen, cache)
+                for path, parsed in cache.files.items():
+                    for pattern in parsed["includes"]:
+                        pattern = os.path.expandvars(os.path.expanduser(pattern))
+                        patterns.add(os.path.join(os.path.dirname(path), pattern))
+            files = {config, SSH_SYSTEM_CONFIG, *map(str, seen)}
+            self.mtimes = dict.fromkeys(files)
+            self.mtimes = self._stat()
+            self.includes = dict.fromkeys(patterns)
+            self.includes = self._expand()
+            # Re-resolve everything tabs have asked about, not just config hosts
+            self.entries = self._resolve_all(aliases | set(self.entries))
+        with self.lock:
+            pending, self.pending = self.pending - set(self.entries), set()
+        if pending:
+            self.entries = {**self.entries, **self._resolve_all(pending)}
+
+    def _resolve_all(self, aliases: set[str]) -> dict:
+        if not aliases:
+            return {}
+        ordered = sorted(aliases)
+        with ThreadPoolExecutor(SSH_RESOLVE_WORKERS) as pool:
+            return dict(zip(ordered, pool.map(_ssh_resolve, ordered)))
+
+
+def _ssh_index() -> _SshIndex:
+    state = _shared_state()
+    index = getattr(state, "ssh_index", None)
+    if index is None:
+        index = state.ssh_index = _SshIndex()
+    return index
+
+
+@functools.lru_cache(maxsize=1)
+def _local_user() -> str:
+    try:
+        return getpass.getuser()
+    except Exception:
+        return ""
+
+
+def _ssh_label(alias: str) -> str:
+    """Tab label for an ssh destination: [user@]hostname [via jump]."""
+    if not alias:
+        return alias
+    entry = _ssh_index().get(alias)
+    if entry is None:
+        return alias
+    user, hostname, jump = entry
+    label = hostname if user in ("", _local_user()) else f"{user}@{hostname}"
+    return f"{label} via {jump}" if jump else label
+
+
+# ----------------------------------------------------------------------------
+# Layout and drawing. Each tab is a list of (fg, bg, text) cell runs, cached per
+# tab id with the inputs that produced it, so an unchanged tab replays its runs
+# without rebuilding the title. kitty clears the tab bar line on every update,
+# so every tab is still drawn each time; only the work behind it is skipped.
+# ----------------------------------------------------------------------------
+
+_run_cache: dict[int, tuple[tuple, list[tuple[int, int, str]]]] = {}
+# (inputs, widths) of the last layout, reused while titles and geometry hold
+_layout_cache: tuple[tuple, list[int]] = ((), [])
+
+
+def _title_parts(tab: TabBarData, index: int) -> tuple[str, str, str, str]:
+    """(prefix, name, location, zoom) of a tab title, once per redraw."""
+    parts = _frame.titles.get(tab.tab_id)
+    if parts is None:
+        ctx = _tab_context(tab)
+        location = (ctx.ssh_host or "remote") if ctx.is_ssh else "local"
+        name = ctx.proc_name or tab.title
+        zoom = " [Z]" if tab.layout_name == "stack" else ""
+        parts = _frame.titles[tab.tab_id] = (f" {index}: ", name, location, zoom)
+    return parts
+
+
+def _join_title(prefix: str, name: str, location: str, zoom: str) -> str:
+    return f"{prefix}{name} ({location}){zoom} "
+
+
+def _middle_ellipsis(text: str, width: int) -> str:
+    if len(text) <= width:
+        return text
+    if width <= 1:
+        return "…"[:width]
+    head = width // 2
+    tail = width - 1 - head
+    return text[:head] + "…" + (text[-tail:] if tail else "")
+
+
+def _fit_title(parts: tuple[str, str, str, str], width: int) -> str:
+    """Squeeze a title into `width` cells, giving up detail in order: the zoom
+    marker, the middle of the location (hostnames keep their start and end),
+    the middle of the process name, and then the end of the title. The tab
+    index is never cut."""
+    prefix, name, location, zoom = parts
+    over = len(_join_title(*parts)) - width
+    if over > 0 and zoom:
+        zoom = ""
+        over -= len(parts[3])
+    if over > 0:
+        location = _middle_ellipsis(location, max(3, len(location) - over))
+        over = len(_join_title(prefix, name, location, zoom)) - width
+    if over > 0:
+        name = _middle_ellipsis(name, max(3, len(name) - over))
+    title = _join_title(prefix, name, location, zoom)
+    if len(title) > width:
+        body = _join_title("", parts[1], parts[2], "")[:-1]
+        room = width - len(prefix) - 1
+        title = prefix + (body[: room - 1] + "…" if room > 0 else "") + " "
+        return title[:width]
+    return title.ljust(width)
+
+
+def _allocate(naturals: list[int], budget: int) -> list[int]:
+    """Split `budget` cells in proportion to each tab's natural width, never
+    giving a tab more than it needs or less than MIN_SHRUNK_WIDTH."""
+    if sum(naturals) <= budget:
+        return list(naturals)
+    floors = [min(n, MIN_SHRUNK_WIDTH) for n in naturals]
+    spare = max(0, budget - sum(floors))
+    extra = [n - f for n, f in zip(naturals, floors)]
+    total = sum(extra) or 1
+    shares = [e * spare / total for e in extra]
+    widths = [f + int(sh) for f, sh in zip(floors, shares)]
+    # Hand out the cells lost to rounding, largest remainders first
+    left = budget - sum(widths)
+    by_remainder = sorted(
+        range(len(widths)), key=lambda k: shares[k] - int(shares[k]), reverse=True
+    )
+    for k in by_remainder[: max(0, left)]:
+        if widths[k] < naturals[k]:
+            widths[k] += 1
+    return widths
+
+
+def _layout_bar(columns: int, before: int, max_tab_length: int) -> None:
+    """Allocate title widths for every tab of this redraw into _frame.widths."""
+    global _layout_cache
+    tm = _frame.tab_manager
+    tabs = getattr(tm, "tab_bar_data", None) if tm is not None else None
+    if callable(tabs):
+        tabs = tabs()
+    if not tabs:
+        return
+    titles = [_title_parts(t, i) for i, t in enumerate(tabs, 1)]
+    naturals = [max(MIN_TAB_WIDTH, len(_join_title(*p))) for p in titles]
+    key = (columns, before, max_tab_length, *naturals)
+    if _layout_cache[0] == key:
+        widths = _layout_cache[1]
+    else:
+        seps = 2 * len(tabs) - (0 if before > 0 else 1)
+        widths = _allocate(naturals, columns - before - seps)
+        # kitty stops drawing (with a red …) once a tab other than the last
+        # ends within max_tab_length of the right edge; keep that room free
+        if len(tabs) > 1:
+            room = columns - max_tab_length - before - (seps - 2)
+            if sum(widths[:-1]) > room:
+                widths[:-1] = _allocate(widths[:-1], max(0, room))
+        _layout_cache = (key, widths)
+    _frame.widths = {t.tab_id: w for t, w in zip(tabs, widths)}
+    for tab_id in _run_cache.keys() - _frame.widths.keys():
+        del _run_cache[tab_id]
+
+
+def _tab_runs(
+    tab: TabBarData, index: int, before: int, width: int | None, max_tab_length: int
+) -> list[tuple[int, int, str]]:
+    is_ssh_tab = _tab_context(tab).is_ssh
+    parts = _title_parts(tab, index)
+    key = (parts, index, before > 0, width, max_tab_length, tab.is_active, is_ssh_tab)
+    cached = _run_cache.get(tab.tab_id)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    # Determine colors
+    if tab.is_active:
+        fg = BLACK
+        bg = CYAN if is_ssh_tab else ORANGE
+    else:
+        fg = FG
+        bg = DIM_CYAN if is_ssh_tab else DIM_ORANGE
+
+    if width is not None:
+        title = _fit_title(parts, width)
+    else:
+        # Per-tab layout: pad to minimum width or truncate if needed
+        title = _join_title(*parts)
+        max_len = max_tab_length - 2  # account for separators
+        if len(title) > max_len:
+            title = title[:max_len - 1] + "… "
+        elif len(title) < MIN_TAB_WIDTH:
+            title = title.ljust(MIN_TAB_WIDTH)
+
+    runs = []
+    # Separator from previous
+    if before > 0:
+        runs.append((BG if index == 1 else DIM, bg, SEP))
+    runs.append((fg, bg, title))
+    # Separator after
+    runs.append((bg, BG, SEP))
+    _run_cache[tab.tab_id] = (key, runs)
+    return runs
 
 
 def draw_tab(
@@ -137,51 +590,89 @@ def draw_tab(
     extra_data: ExtraData,
 ) -> int:
     """Draw a single tab."""
-    # Determine colors
-    is_ssh_tab, ssh_host = _get_ssh_info(tab)
-    if tab.is_active:
-        fg = BLACK
-        bg = CYAN if is_ssh_tab else ORANGE
-    else:
-        fg = FG
-        bg = DIM_CYAN if is_ssh_tab else DIM_ORANGE
+    if index == 1:
+        _begin_frame()
+        if WHOLE_BAR_LAYOUT:
+            _layout_bar(screen.columns, before, max_tab_length)
+    width = _frame.widths.get(tab.tab_id) if _frame.widths else None
+    for fg, bg, text in _tab_runs(tab, index, before, width, max_tab_length):
+        screen.cursor.fg = fg
+        screen.cursor.bg = bg
+        screen.draw(text)
+    return screen.cursor.x
 
-    # Get process name and build title
-    proc = _get_proc_name(tab)
-    zoom = " [Z]" if tab.layout_name == "stack" else ""
 
-    # Build location indicator
-    if is_ssh_tab:
-        location = ssh_host if ssh_host else "remote"
-    else:
-        location = "local"
+# ----------------------------------------------------------------------------
+# Opt-in profiling: KITTY_TAB_BAR_PROFILE=1 (or a log path) times every call of
+# the hot functions below and appends p50/p90/p99/max summaries to the log
+# every PROFILE_FLUSH_SECONDS and when kitty exits. Off, nothing is wrapped.
+# ----------------------------------------------------------------------------
 
-    if proc:
-        title = f" {index}: {proc} ({location}){zoom} "
-    else:
-        title = f" {index}: {tab.title} ({location}){zoom} "
+PROFILE_ENV = "KITTY_TAB_BAR_PROFILE"
+PROFILE_FLUSH_SECONDS = 10.0
+PROFILED = ("draw_tab", "_tab_runs", "_title_parts", "_tab_context", "_parse_ssh_host")
 
-    # Pad to minimum width or truncate if needed
-    max_len = max_tab_length - 2  # account for separators
-    if len(title) > max_len:
-        title = title[:max_len - 1] + "… "
-    elif len(title) < MIN_TAB_WIDTH:
-        title = title.ljust(MIN_TAB_WIDTH)
 
-    # Draw separator from previous
-    if before > 0:
-        screen.cursor.fg = BG if index == 1 else DIM
-        screen.cursor.bg = bg
-        screen.draw(SEP)
+class _Profiler:
+    """Per-function call timings, summarized as percentiles into a log file."""
 
-    # Draw tab content
-    screen.cursor.fg = fg
-    screen.cursor.bg = bg
-    screen.draw(title)
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.samples: dict[str, list[int]] = {}
+        self.last_flush = time.monotonic()
 
-    # Draw separator after
-    screen.cursor.fg = bg
-    screen.cursor.bg = BG
-    screen.draw(SEP)
+    def wrap(self, fn: Any) -> Any:
+        samples = self.samples.setdefault(fn.__name__, [])
 
-    return screen.cursor.x
+        @functools.wraps(fn)
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter_ns() - start)
+                if fn.__name__ == "draw_tab":
+                    self.maybe_flush()
+
+        return timed
+
+    def maybe_flush(self) -> None:
+        if time.monotonic() - self.last_flush >= PROFILE_FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self) -> None:
+        self.last_flush = time.monotonic()
+        lines = []
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        for name, samples in self.samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            samples.clear()
+
+            def pct(q: float) -> float:
+                return ordered[min(len(ordered) - 1, int(q * len(ordered)))] / 1000
+
+            lines.append(
+                f"{stamp} {name:<16} n={len(ordered):<6} p50={pct(0.5):.1f}us "
+                f"p90={pct(0.9):.1f}us p99={pct(0.99):.1f}us "
+                f"max={ordered[-1] / 1000:.1f}us"
+            )
+        if lines:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as log:
+                log.write("\n".join(lines) + "\n")
+
+
+def _profile_path(value: str) -> str:
+    if value not in ("1", "true", "yes", "on"):
+        return os.path.expanduser(value)
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache, "kitty", "tab_bar_profile.log")
+
+
+if os.environ.get(PROFILE_ENV):
+    _profiler = _Profiler(_profile_path(os.environ[PROFILE_ENV]))
+    atexit.register(_profiler.flush)
+    for _name in PROFILED:
+        globals()[_name] = _profiler.wrap(globals()[_name])
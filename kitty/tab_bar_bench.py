@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# Headless benchmark for the custom tab bar (tab_bar.py), no kitty GUI needed
+#
+# Installs stand-ins for the kitty modules tab_bar.py imports (get_boss, Screen,
+# TabBarData, as_rgb) and for its `ssh -G` host resolver (a fixed table, so no
+# ssh runs and ~/.ssh/config is never read), loads tab_bar.py the way kitty
+# does (runpy), and redraws bars of 1 to 200 tabs backed by synthetic
+# foreground process trees. Reports per-redraw latency percentiles and how
+# often /proc would have been walked.
+#
+#   python3 kitty/tab_bar_bench.py                      # default tab counts
+#   python3 kitty/tab_bar_bench.py --tabs 50 --events   # invalidate every frame
+#   python3 kitty/tab_bar_bench.py --json after.json --compare before.json
+
+import argparse
+import json
+import os
+import random
+import runpy
+import sys
+import time
+import types
+from dataclasses import dataclass
+from typing import Any
+
+TAB_BAR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tab_bar.py")
+TAB_COUNTS = (1, 10, 50, 100, 200)
+
+# Foreground jobs a synthetic tab can run (the shell is always underneath).
+JOBS = (
+    [],
+    ["nvim", "README.md"],
+    ["python3", "-m", "http.server"],
+    ["ssh", "-p", "2222", "deploy@build-01"],
+    ["ssh", "-J", "bastion", "-o", "ServerAliveInterval=30", "db-primary"],
+    ["/usr/bin/ssh", "-E", "/tmp/ssh.log", "-W", "db:5432", "gateway"],
+    ["top"],
+)
+
+
+# ----------------------------------------------------------------------------
+# kitty stand-ins
+# ----------------------------------------------------------------------------
+
+
+class Cursor:
+    x = 0
+    fg = 0
+    bg = 0
+
+
+class Screen:
+    def __init__(self, columns: int) -> None:
+        self.columns = columns
+        self.cursor = Cursor()
+
+    def draw(self, text: str) -> None:
+        self.cursor.x += len(text)
+
+
+@dataclass
+class TabBarData:
+    tab_id: int
+    title: str
+    is_active: bool = False
+    layout_name: str = "tall"
+    num_windows: int = 1
+
+
+class Stats:
+    proc_reads = 0
+
+
+class Child:
+    def __init__(self, procs: list, cost: float) -> None:
+        self._procs = procs
+        self._cost = cost
+
+    @property
+    def foreground_processes(self) -> list:
+        # kitty walks /proc here; model it as a copy plus a fixed cost.
+        Stats.proc_reads += 1
+        if self._cost:
+            deadline = time.perf_counter() + self._cost
+            while time.perf_counter() < deadline:
+                pass
+        return [dict(p) for p in self._procs]
+
+
+class Window:
+    def __init__(self, wid: int, procs: list, kitten: list | None, cost: float):
+        self.id = wid
+        self.child = Child(procs, cost)
+        self._kitten = kitten
+        self.child_is_remote = kitten is not None
+
+    def ssh_kitten_cmdline(self) -> list | None:
+        return self._kitten
+
+
+class Tab:
+    def __init__(self, window: Window) -> None:
+        self.active_window = window
+
+
+class TabManager:
+    def __init__(self, tabs: dict[int, Tab], data: list[TabBarData]) -> None:
+        self.tabs = tabs
+        self.tab_bar_data = data
+
+    def tab_for_id(self, tab_id: int) -> Tab | None:
+        return self.tabs.get(tab_id)
+
+
+class Boss:
+    active_tab_manager: TabManager | None = None
+
+
+BOSS = Boss()
+
+# What `ssh -G` would report for the JOBS' hosts; the rest (kitten hosts) are
+# unknown and labelled as typed, like an alias ssh cannot resolve.
+SSH_HOSTS = {
+    "build-01": ("deploy", "build-01.ci.example.com", ""),
+    "db-primary": ("postgres", "10.0.0.5", "bastion"),
+    "gateway": ("", "gw.example.com", ""),
+}
+
+
+class SshIndex:
+    """Fixed stand-in for tab_bar's background `ssh -G` index."""
+
+    def get(self, alias: str) -> tuple[str, str, str] | None:
+        return SSH_HOSTS.get(alias)
+
+
+def install_kitty_stubs() -> None:
+    kitty = types.ModuleType("kitty")
+    boss = types.ModuleType("kitty.boss")
+    boss.get_boss = lambda: BOSS
+    boss.Boss = Boss
+    fdt = types.ModuleType("kitty.fast_data_types")
+    fdt.Screen = Screen
+    tab_bar = types.ModuleType("kitty.tab_bar")
+    tab_bar.DrawData = Any
+    tab_bar.ExtraData = Any
+    tab_bar.TabBarData = TabBarData
+    tab_bar.as_rgb = lambda color: (color << 8) | 2
+    window = types.ModuleType("kitty.window")
+    window.Window = Window
+    sys.modules.update(
+        {
+            "kitty": kitty,
+            "kitty.boss": boss,
+            "kitty.fast_data_types": fdt,
+            "kitty.tab_bar": tab_bar,
+            "kitty.window": window,
+        }
+    )
+
+
+# ----------------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------------
+
+
+def build_tabs(count: int, proc_cost: float, seed: int = 0) -> list[TabBarData]:
+    rnd = random.Random(seed)
+    tabs, data = {}, []
+    for tab_id in range(1, count + 1):
+        job = rnd.choice(JOBS)
+        procs = [{"pid": 100 * tab_id, "cmdline": ["/bin/zsh", "-l"]}]
+        if job:
+            procs.append({"pid": 100 * tab_id + 1, "cmdline": list(job)})
+        kitten = None
+        if rnd.random() < 0.1:
+            kitten = ["kitten", "ssh", f"user@kitten-host-{tab_id}"]
+        tabs[tab_id] = Tab(Window(tab_id, procs, kitten, proc_cost))
+        layout = rnd.choice(("tall", "stack"))
+        data.append(TabBarData(tab_id, f"tab {tab_id}", layout_name=layout))
+    data[0].is_active = True
+    BOSS.active_tab_manager = TabManager(tabs, data)
+    return data
+
+
+def redraw(ns: dict, data: list[TabBarData], columns: int) -> None:
+    screen = Screen(columns)
+    max_len = max(8, columns // max(1, len(data)))
+    for index, tab in enumerate(data, 1):
+        ns["draw_tab"](
+            None, screen, tab, screen.cursor.x, max_len, index, index == len(data), None
+        )
+
+
+def bench(
+    ns: dict, count: int, frames: int, columns: int, proc_cost: float, events: bool
+) -> dict:
+    data = build_tabs(count, proc_cost)
+    state = sys.modules.get(ns.get("STATE_MODULE", ""))
+    if state is not None:
+        state.proc_cache.clear()
+    Stats.proc_reads = 0
+    timings = []
+    for _ in range(frames):
+        if events and state is not None:
+            state.proc_cache.clear()  # as if every window sent an event
+        start = time.perf_counter_ns()
+        redraw(ns, data, columns)
+        timings.append(time.perf_counter_ns() - start)
+    timings.sort()
+
+    def pct(q: float) -> float:
+        return timings[min(len(timings) - 1, int(q * len(timings)))] / 1000
+
+    return {
+        "tabs": count,
+        "frames": frames,
+        "p50_us": round(pct(0.5), 1),
+        "p90_us": round(pct(0.9), 1),
+        "p99_us": round(pct(0.99), 1),
+        "max_us": round(timings[-1] / 1000, 1),
+        "proc_reads_per_frame": round(Stats.proc_reads / frames, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the kitty tab bar.")
+    parser.add_argument("--tabs", default=",".join(map(str, TAB_COUNTS)))
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--columns", type=int, default=240)
+    parser.add_argument(
+        "--proc-cost-us",
+        type=float,
+        default=50.0,
+        help="simulated cost of one foreground_processes /proc walk",
+    )
+    parser.add_argument(
+        "--events", action="store_true", help="invalidate the process cache every frame"
+    )
+    parser.add_argument("--json", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    args = parser.parse_args()
+
+    install_kitty_stubs()
+    ns = runpy.run_path(TAB_BAR, run_name="__kitty_tab_bar__")
+    sys.modules[ns["STATE_MODULE"]].ssh_index = SshIndex()
+    cost = args.proc_cost_us / 1e6
+    results = [
+        bench(ns, int(n), args.frames, args.columns, cost, args.events)
+        for n in args.tabs.split(",")
+        if n
+    ]
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = {r["tabs"]: r for r in json.load(fh)["results"]}
+    header = ("p50 us", "p90 us", "p99 us", "max us")
+    print(f"{'tabs':>5} " + " ".join(f"{h:>9}" for h in header) + f" {'/proc':>6}")
+    for r in results:
+        line = (
+            f"{r['tabs']:>5} {r['p50_us']:>9} {r['p90_us']:>9} {r['p99_us']:>9} "
+            f"{r['max_us']:>9} {r['proc_reads_per_frame']:>6}"
+        )
+        old = baseline.get(r["tabs"])
+        if old and old["p50_us"]:
+            line += f"   p50 {r['p50_us'] / old['p50_us']:.2f}x baseline"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"args": vars(args), "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
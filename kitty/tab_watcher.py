@@ -0,0 +1,43 @@
+# Window event hooks for the custom tab bar (loaded via `watcher` in kitty.conf)
+# Drops a window's cached foreground-process labels whenever kitty reports an
+# event that can change them, so tab_bar.py can cache them between redraws.
+
+import sys
+import types
+from typing import Any
+
+from kitty.boss import Boss
+from kitty.window import Window
+
+# Must match STATE_MODULE in tab_bar.py.
+STATE_MODULE = "dotfiles_kitty_tab_state"
+
+
+def _shared_state() -> types.ModuleType:
+    state = sys.modules.get(STATE_MODULE)
+    if state is None:
+        state = types.ModuleType(STATE_MODULE)
+        state.proc_cache = {}  # window id -> (timestamp, procs, name, is_ssh, host)
+        sys.modules[STATE_MODULE] = state
+    return state
+
+
+def _invalidate(window: Window) -> None:
+    _shared_state().proc_cache.pop(window.id, None)
+
+
+def on_close(boss: Boss, window: Window, data: dict[str, Any]) -> None:
+    _invalidate(window)
+
+
+def on_title_change(boss: Boss, window: Window, data: dict[str, Any]) -> None:
+    _invalidate(window)
+
+
+def on_focus_change(boss: Boss, window: Window, data: dict[str, Any]) -> None:
+    _invalidate(window)
+
+
+def on_cmd_startstop(boss: Boss, window: Window, data: dict[str, Any]) -> None:
+    # Shell integration: a command started or finished in this window.
+    _invalidate(window)